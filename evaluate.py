@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Bewertung der Rechteckerkennung gegen Ground-Truth-Dateien.
+
+Für jede Seite eines Korpus wird process_image_for_rectangles ausgeführt und mit einer
+Ground-Truth-JSON-Datei im Format von "Rechtecke speichern" (wie HV1.json) verglichen.
+Ausgegeben werden Precision, Recall und mittlere IoU zusammen mit Laufzeit und Speicherbedarf
+pro Seite. Der Speicherbedarf ist der Zuwachs der maximalen RSS (ru_maxrss) während der Erkennung
+und enthält damit auch die Puffer von OpenCV und NumPy, aber nicht den Grundbedarf des Prozesses.
+Unter Linux wird der Höchststand vor jeder Seite zurückgesetzt; auf anderen Unix-Systemen ist der
+Wert eine Untergrenze, da eine frühere Seite im selben Worker den Höchststand schon angehoben haben kann.
+
+Korpus-Aufbau (ein Verzeichnis):
+  plan.png + plan.json              - Bild mit Ground Truth
+  plan.pdf + plan.json              - Ground Truth für Seite 1 eines PDFs
+  plan.pdf + plan_page_2.json       - Ground Truth für Seite 2 eines PDFs
+
+Aufruf:
+  python evaluate.py <korpus_verzeichnis> [--min-area 1000] [--epsilon-coef 0.02]
+                     [--blur-kernel 5] [--canny-low 50] [--canny-high 150]
+                     [--profile profil.json] [--iou-threshold 0.5] [--workers N] [--output report.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+try:
+    import resource  # Nur unter Unix verfügbar
+except ImportError:
+    resource = None
+
+from test import convert_pdf_page_to_image, is_pdf_file, load_detector_profile, pil_to_opencv, process_image_for_rectangles
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tiff")
+
+DEFAULT_PARAMS = {
+    "min_area": 1000,
+    "epsilon_coef": 0.02,
+    "blur_kernel": 5,
+    "canny_low": 50,
+    "canny_high": 150,
+}
+
+def load_ground_truth(json_path):
+    """
+    Lädt Rechtecke aus einer JSON-Datei im Format von save_rectangles.
+
+    :param json_path: Pfad zur JSON-Datei
+    :return: numpy-Array der Form (N, 4) mit (x_min, y_min, x_max, y_max)
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    rectangles = [rect for rect in data.get("rectangles", []) if len(rect) == 4]
+    return np.array(rectangles, dtype=np.float64).reshape(-1, 4)
+
+def find_corpus_pages(corpus_dir):
+    """
+    Sucht alle Seiten mit zugehöriger Ground Truth im Korpus-Verzeichnis.
+
+    :param corpus_dir: Verzeichnis mit Bildern/PDFs und JSON-Dateien
+    :return: Liste von (Dateipfad, Seitennummer 0-basiert, Ground-Truth-Pfad)
+    """
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        path = os.path.join(corpus_dir, name)
+        stem, ext = os.path.splitext(path)
+
+        if ext.lower() in IMAGE_EXTENSIONS:
+            if os.path.exists(stem + ".json"):
+                pages.append((path, 0, stem + ".json"))
+
+        elif is_pdf_file(path):
+            if os.path.exists(stem + ".json"):
+                pages.append((path, 0, stem + ".json"))
+            prefix = os.path.basename(stem) + "_page_"
+            for gt_name in sorted(os.listdir(corpus_dir)):
+                if gt_name.startswith(prefix) and gt_name.endswith(".json"):
+                    page_label = gt_name[len(prefix):-len(".json")]
+                    if page_label.isdigit() and int(page_label) >= 1:
+                        pages.append((path, int(page_label) - 1, os.path.join(corpus_dir, gt_name)))
+    return pages
+
+def pairwise_iou(boxes_a, boxes_b):
+    """
+    Berechnet die IoU-Matrix zwischen zwei Rechteckmengen vektorisiert.
+
+    :param boxes_a: Array (N, 4) mit (x_min, y_min, x_max, y_max)
+    :param boxes_b: Array (M, 4) mit (x_min, y_min, x_max, y_max)
+    :return: Array (N, M) mit IoU-Werten
+    """
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = inter_w * inter_h
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+def match_rectangles(predicted, ground_truth, iou_threshold=0.5):
+    """
+    Ordnet erkannte Rechtecke der Ground Truth zu (gierig nach absteigender IoU, jeweils 1:1).
+
+    :param predicted: Array (N, 4) erkannter Rechtecke
+    :param ground_truth: Array (M, 4) der Ground Truth
+    :param iou_threshold: Mindest-IoU für einen Treffer
+    :return: Liste der IoU-Werte aller Treffer
+    """
+    if len(predicted) == 0 or len(ground_truth) == 0:
+        return []
+
+    iou = pairwise_iou(predicted, ground_truth)
+    pred_idx, gt_idx = np.nonzero(iou >= iou_threshold)
+    candidates = iou[pred_idx, gt_idx]
+    order = np.argsort(-candidates, kind="stable")
+
+    used_pred = np.zeros(len(predicted), dtype=bool)
+    used_gt = np.zeros(len(ground_truth), dtype=bool)
+    matched = []
+    for k in order:
+        p, g = pred_idx[k], gt_idx[k]
+        if used_pred[p] or used_gt[g]:
+            continue
+        used_pred[p] = used_gt[g] = True
+        matched.append(float(candidates[k]))
+    return matched
+
+def load_page_image(path, page_num, dpi=200):
+    """Lädt eine Korpus-Seite als OpenCV-Bild"""
+    if is_pdf_file(path):
+        return pil_to_opencv(convert_pdf_page_to_image(path, page_num, dpi))
+    img = cv2.imread(path)
+    if img is None:
+        raise ValueError(f"Konnte Bild nicht laden: {path}")
+    return img
+
+def _reset_peak_rss():
+    """Setzt den Höchststand der RSS auf den aktuellen Wert zurück (nur Linux)"""
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _max_rss_bytes():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux liefert KiB, macOS Bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+def evaluate_page(task):
+    """
+    Bewertet eine einzelne Seite (läuft in einem Worker-Prozess).
+
+    :param task: (Dateipfad, Seitennummer, Ground-Truth-Pfad, Parameter-Dict, IoU-Schwelle, Speicher messen)
+    :return: Dict mit Kennzahlen der Seite
+    """
+    path, page_num, gt_path, params, iou_threshold, measure_memory = task
+    img = load_page_image(path, page_num)
+    ground_truth = load_ground_truth(gt_path)
+
+    # Zuwachs des RSS-Höchststands; erfasst im Gegensatz zu tracemalloc auch native OpenCV-Puffer
+    rss_before = None
+    if measure_memory and resource is not None:
+        _reset_peak_rss()
+        rss_before = _max_rss_bytes()
+
+    start = time.perf_counter()
+    predicted = process_image_for_rectangles(img, draw=False, **params)
+    latency = time.perf_counter() - start
+
+    peak_memory = _max_rss_bytes() - rss_before if rss_before is not None else None
+
+    predicted = np.array(predicted, dtype=np.float64).reshape(-1, 4)
+    matched = match_rectangles(predicted, ground_truth, iou_threshold)
+
+    return {
+        "file": os.path.basename(path),
+        "page": page_num + 1,
+        "predicted": len(predicted),
+        "ground_truth": len(ground_truth),
+        "true_positives": len(matched),
+        "precision": len(matched) / len(predicted) if len(predicted) else 0.0,
+        "recall": len(matched) / len(ground_truth) if len(ground_truth) else 0.0,
+        "mean_iou": sum(matched) / len(matched) if matched else 0.0,
+        "latency_s": latency,
+        "peak_memory_mb": peak_memory / (1024 * 1024) if peak_memory is not None else None,
+    }
+
+def evaluate_corpus(pages, params=None, iou_threshold=0.5, workers=None, measure_memory=True):
+    """
+    Bewertet alle Seiten eines Korpus parallel in einem Prozess-Pool.
+
+    :param pages: Liste von (Dateipfad, Seitennummer, Ground-Truth-Pfad) wie von find_corpus_pages
+    :param params: Parameter für process_image_for_rectangles (Standardwerte wenn None)
+    :param iou_threshold: Mindest-IoU für einen Treffer
+    :param workers: Anzahl Worker-Prozesse (None = Anzahl CPU-Kerne)
+    :param measure_memory: Spitzen-Speicherbedarf pro Seite messen
+    :return: (Liste der Seitenergebnisse, Zusammenfassung als Dict)
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    tasks = [(path, page_num, gt_path, params, iou_threshold, measure_memory)
+             for path, page_num, gt_path in pages]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(evaluate_page, tasks))
+
+    return results, summarize_results(results)
+
+def summarize_results(results):
+    """
+    Fasst Seitenergebnisse zusammen (Precision/Recall über alle Rechtecke, nicht über Seiten gemittelt).
+
+    :param results: Liste der Seitenergebnisse
+    :return: Dict mit Gesamtkennzahlen
+    """
+    predicted = sum(r["predicted"] for r in results)
+    ground_truth = sum(r["ground_truth"] for r in results)
+    true_positives = sum(r["true_positives"] for r in results)
+    latencies = sorted(r["latency_s"] for r in results)
+    memories = [r["peak_memory_mb"] for r in results if r["peak_memory_mb"] is not None]
+    iou_sum = sum(r["mean_iou"] * r["true_positives"] for r in results)
+
+    return {
+        "pages": len(results),
+        "precision": true_positives / predicted if predicted else 0.0,
+        "recall": true_positives / ground_truth if ground_truth else 0.0,
+        "mean_iou": iou_sum / true_positives if true_positives else 0.0,
+        "total_latency_s": sum(latencies),
+        "median_latency_s": latencies[len(latencies) // 2] if latencies else 0.0,
+        "max_peak_memory_mb": max(memories) if memories else None,
+    }
+
+def print_report(results, summary):
+    print(f"{'Datei':<30} {'Seite':>5} {'Erk.':>6} {'GT':>6} {'Prec.':>6} {'Recall':>6} {'IoU':>6} {'Zeit[s]':>8} {'Speicher[MB]':>12}")
+    for r in results:
+        memory = f"{r['peak_memory_mb']:.1f}" if r["peak_memory_mb"] is not None else "-"
+        print(f"{r['file'][:30]:<30} {r['page']:>5} {r['predicted']:>6} {r['ground_truth']:>6} "
+              f"{r['precision']:>6.3f} {r['recall']:>6.3f} {r['mean_iou']:>6.3f} {r['latency_s']:>8.3f} {memory:>12}")
+
+    print(f"\nZusammenfassung über {summary['pages']} Seite(n):")
+    print(f"  Precision: {summary['precision']:.3f}")
+    print(f"  Recall:    {summary['recall']:.3f}")
+    print(f"  Mittlere IoU: {summary['mean_iou']:.3f}")
+    print(f"  Laufzeit gesamt: {summary['total_latency_s']:.2f} s (Median pro Seite: {summary['median_latency_s']:.3f} s)")
+    if summary["max_peak_memory_mb"] is not None:
+        print(f"  Maximaler Spitzen-Speicher pro Seite: {summary['max_peak_memory_mb']:.1f} MB (Zuwachs der RSS während der Erkennung)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bewertet die Rechteckerkennung gegen Ground-Truth-Dateien")
+    parser.add_argument("corpus_dir", help="Verzeichnis mit Bildern/PDFs und Ground-Truth-JSON-Dateien")
+    parser.add_argument("--min-area", type=float, default=DEFAULT_PARAMS["min_area"])
+    parser.add_argument("--epsilon-coef", type=float, default=DEFAULT_PARAMS["epsilon_coef"])
+    parser.add_argument("--blur-kernel", type=int, default=DEFAULT_PARAMS["blur_kernel"])
+    parser.add_argument("--canny-low", type=int, default=DEFAULT_PARAMS["canny_low"])
+    parser.add_argument("--canny-high", type=int, default=DEFAULT_PARAMS["canny_high"])
+    parser.add_argument("--profile", help="Parameterprofil laden (überschreibt die Einzelparameter)")
+    parser.add_argument("--iou-threshold", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Worker-Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--no-memory", action="store_true", help="Speicherbedarf nicht messen")
+    parser.add_argument("--output", help="Bericht zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    pages = find_corpus_pages(args.corpus_dir)
+    if not pages:
+        print(f"Fehler: Keine Seiten mit Ground Truth in {args.corpus_dir} gefunden")
+        sys.exit(1)
+
+    params = {
+        "min_area": args.min_area,
+        "epsilon_coef": args.epsilon_coef,
+        "blur_kernel": args.blur_kernel,
+        "canny_low": args.canny_low,
+        "canny_high": args.canny_high,
+    }
+    if args.profile:
+        params.update(load_detector_profile(args.profile))
+    results, summary = evaluate_corpus(pages, params, args.iou_threshold, args.workers, not args.no_memory)
+    print_report(results, summary)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"params": params, "summary": summary, "pages": results}, f, indent=2, ensure_ascii=False)
+        print(f"\nBericht gespeichert in: {args.output}")
+
+if __name__ == "__main__":
+    main()
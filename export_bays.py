@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Massenexport einzelner Stellplatz-Ausschnitte, z.B. als Trainingsdaten für ein Belegungsmodell.
+
+Für jede Seite werden die Rechtecke aus einer JSON-Datei im Format von "Rechtecke speichern"
+gelesen (plan.json bzw. plan_page_<n>.json wie bei evaluate.py) oder automatisch erkannt.
+Standardmäßig wird jede Seite vollständig (Laden, Erkennung, Kodierung) in einem eigenen
+Worker-Prozess verarbeitet, sodass der Durchsatz mit der Anzahl der Kerne wächst. Im Thread-Modus
+werden die Seiten nacheinander geladen und erkannt und nur die Ausschnitte (NumPy-Views auf das
+Seitenbild) parallel kodiert; PyMuPDF ist nicht threadsicher, daher werden Seiten dort nicht überlappt.
+
+Ausgabe entweder als Verzeichnisbaum (<ausgabe>/<datei>-<hash>/page_<n>/bay_<i>.<format>) oder als
+Tar-Shards (<ausgabe>/shard-00000.tar, ...), jeweils mit manifest.jsonl. <datei> ist der vollständige
+Dateiname, <hash> ein kurzer Hash des absoluten Pfads, damit gleichnamige Dateien aus verschiedenen
+Verzeichnissen (oder plan.png und plan.pdf) sich nicht überschreiben.
+
+Aufruf:
+  python export_bays.py <datei_oder_verzeichnis> [...] -o <ausgabe>
+                        [--format png|jpg|webp] [--quality 90] [--padding 0]
+                        [--shard-size 10000] [--workers N] [--executor process|thread]
+                        [--profile profil.json]
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import fitz  # PyMuPDF
+
+from evaluate import IMAGE_EXTENSIONS, load_ground_truth, load_page_image
+from test import assign_labels, extract_text_spans, is_pdf_file, load_detector_profile, process_image_for_rectangles
+
+FORMATS = ("png", "jpg", "webp")
+
+def encode_params(image_format, quality):
+    """
+    :param image_format: "png", "jpg" oder "webp"
+    :param quality: Qualität 1-100 (bei PNG auf die Kompressionsstufe 0-9 abgebildet)
+    :return: Parameterliste für cv2.imencode
+    """
+    if image_format == "jpg":
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if image_format == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    # Höhere Qualität = schnellere, schwächere Kompression (PNG ist verlustfrei)
+    return [cv2.IMWRITE_PNG_COMPRESSION, max(0, min(9, 9 - int(quality) // 11))]
+
+def encode_crop(crop, image_format, params):
+    """Kodiert einen Ausschnitt (View) als Bilddatei im Speicher"""
+    ok, buffer = cv2.imencode("." + image_format, crop, params)
+    if not ok:
+        raise ValueError("Kodierung fehlgeschlagen")
+    return buffer.tobytes()
+
+def find_export_pages(paths):
+    """
+    Sammelt alle zu exportierenden Seiten.
+
+    :param paths: Liste von Dateien oder Verzeichnissen
+    :return: Liste von (Dateipfad, Seitennummer 0-basiert, Rechteck-JSON-Pfad oder None)
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)))
+        else:
+            files.append(path)
+
+    pages = []
+    for path in files:
+        stem, ext = os.path.splitext(path)
+        if is_pdf_file(path):
+            with fitz.open(path) as doc:
+                page_count = len(doc)
+            for page_num in range(page_count):
+                candidates = [f"{stem}_page_{page_num + 1}.json"] + ([stem + ".json"] if page_num == 0 else [])
+                json_path = next((c for c in candidates if os.path.exists(c)), None)
+                pages.append((path, page_num, json_path))
+        elif ext.lower() in IMAGE_EXTENSIONS:
+            pages.append((path, 0, stem + ".json" if os.path.exists(stem + ".json") else None))
+    return pages
+
+def _page_rectangles(path, page_num, json_path, img, detector_params):
+    """Rechtecke und Labels einer Seite aus JSON oder per Erkennung"""
+    labels = None
+    if json_path is not None:
+        rectangles = [tuple(int(v) for v in rect) for rect in load_ground_truth(json_path)]
+        with open(json_path, 'r', encoding='utf-8') as f:
+            labels = json.load(f).get("labels")
+    else:
+        rectangles = [tuple(int(v) for v in rect)
+                      for rect in process_image_for_rectangles(img, draw=False, **detector_params)]
+
+    if labels is None or len(labels) != len(rectangles):
+        labels = assign_labels(rectangles, extract_text_spans(path, page_num)) if is_pdf_file(path) else [None] * len(rectangles)
+    return rectangles, labels
+
+def _page_crops(img, rectangles, padding):
+    """Liefert (Stellplatzindex, Rechteck, View) für alle nicht-leeren Ausschnitte"""
+    height, width = img.shape[:2]
+    for bay, (x1, y1, x2, y2) in enumerate(rectangles, start=1):
+        x1, x2 = max(0, min(x1, x2) - padding), min(width, max(x1, x2) + padding)
+        y1, y2 = max(0, min(y1, y2) - padding), min(height, max(y1, y2) + padding)
+        if x2 > x1 and y2 > y1:
+            yield bay, (x1, y1, x2, y2), img[y1:y2, x1:x2]
+
+def _record(path, page_num, bay, rect, label, image_format, data):
+    source_key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    name = f"{os.path.basename(path)}-{source_key}/page_{page_num + 1}/bay_{bay:04d}.{image_format}"
+    meta = {"name": name, "source": os.path.abspath(path), "page": page_num + 1, "bay": bay,
+            "rect": list(rect), "label": label}
+    return name, data, meta
+
+def export_page(job):
+    """
+    Exportiert eine Seite vollständig (läuft im Prozess-Modus in einem Worker-Prozess).
+
+    :param job: (Dateipfad, Seitennummer, JSON-Pfad, Format, Qualität, Rand, Erkennungsparameter)
+    :return: Liste von (Name, kodierte Bytes, Metadaten)
+    """
+    path, page_num, json_path, image_format, quality, padding, detector_params = job
+    img = load_page_image(path, page_num)
+    rectangles, labels = _page_rectangles(path, page_num, json_path, img, detector_params)
+    params = encode_params(image_format, quality)
+    return [_record(path, page_num, bay, rect, labels[bay - 1], image_format, encode_crop(crop, image_format, params))
+            for bay, rect, crop in _page_crops(img, rectangles, padding)]
+
+class DirectoryWriter:
+    """Schreibt Ausschnitte als Verzeichnisbaum mit manifest.jsonl"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest = open(os.path.join(output_dir, "manifest.jsonl"), 'w', encoding='utf-8')
+
+    def write(self, name, data, meta):
+        path = os.path.join(self.output_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.manifest.write(json.dumps(dict(meta, file=name), ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.manifest.close()
+
+class ShardWriter:
+    """Schreibt Ausschnitte in Tar-Archive mit fester Anzahl Einträge pro Shard und manifest.jsonl"""
+
+    def __init__(self, output_dir, shard_size):
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest = open(os.path.join(output_dir, "manifest.jsonl"), 'w', encoding='utf-8')
+        self.shard_index = -1
+        self.shard = None
+        self.shard_name = None
+        self.entries = 0
+
+    def write(self, name, data, meta):
+        if self.shard is None or self.entries >= self.shard_size:
+            self._next_shard()
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.shard.addfile(info, io.BytesIO(data))
+        self.entries += 1
+        self.manifest.write(json.dumps(dict(meta, shard=self.shard_name), ensure_ascii=False) + "\n")
+
+    def _next_shard(self):
+        if self.shard is not None:
+            self.shard.close()
+        self.shard_index += 1
+        self.shard_name = f"shard-{self.shard_index:05d}.tar"
+        self.shard = tarfile.open(os.path.join(self.output_dir, self.shard_name), 'w')
+        self.entries = 0
+
+    def close(self):
+        if self.shard is not None:
+            self.shard.close()
+        self.manifest.close()
+
+def export_bays(pages, writer, image_format="png", quality=90, padding=0, workers=None,
+                executor="process", detector_params=None):
+    """
+    Exportiert alle Stellplatz-Ausschnitte der angegebenen Seiten.
+
+    Im Prozess-Modus (Standard) wird jede Seite komplett in einem Worker-Prozess verarbeitet.
+    Im Thread-Modus werden die Seiten nacheinander geladen und erkannt, parallel läuft nur die
+    Kodierung der Ausschnitte einer Seite; der Durchsatz ist dann durch Laden und Erkennung begrenzt.
+    Geschrieben wird immer im Hauptthread, damit Manifest und Shards konsistent bleiben.
+
+    :param pages: Liste von (Dateipfad, Seitennummer, JSON-Pfad oder None) wie von find_export_pages
+    :param writer: DirectoryWriter oder ShardWriter
+    :param image_format: "png", "jpg" oder "webp"
+    :param quality: Qualität 1-100
+    :param padding: Zusätzlicher Rand um jeden Ausschnitt in Pixeln
+    :param workers: Anzahl Threads bzw. Prozesse (None = Standard des Executors)
+    :param executor: "thread" oder "process"
+    :param detector_params: Parameter für process_image_for_rectangles, falls keine JSON vorhanden
+    :return: Anzahl exportierter Ausschnitte
+    """
+    if image_format not in FORMATS:
+        raise ValueError(f"Unbekanntes Format: {image_format}")
+    detector_params = detector_params or {}
+    count = 0
+
+    if executor == "process":
+        jobs = [(path, page_num, json_path, image_format, quality, padding, detector_params)
+                for path, page_num, json_path in pages]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for records in pool.map(export_page, jobs):
+                for record in records:
+                    writer.write(*record)
+                    count += 1
+        return count
+
+    params = encode_params(image_format, quality)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, page_num, json_path in pages:
+            img = load_page_image(path, page_num)
+            rectangles, labels = _page_rectangles(path, page_num, json_path, img, detector_params)
+            crops = list(_page_crops(img, rectangles, padding))
+            encoded = pool.map(lambda crop: encode_crop(crop[2], image_format, params), crops)
+            for (bay, rect, _), data in zip(crops, encoded):
+                writer.write(*_record(path, page_num, bay, rect, labels[bay - 1], image_format, data))
+                count += 1
+            print(f"{os.path.basename(path)} Seite {page_num + 1}: {len(crops)} Ausschnitt(e)")
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportiert Stellplatz-Ausschnitte als Einzelbilder")
+    parser.add_argument("paths", nargs="+", help="Bilder, PDFs oder Verzeichnisse")
+    parser.add_argument("-o", "--output", required=True, help="Ausgabeverzeichnis")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--quality", type=int, default=90, help="Qualität 1-100")
+    parser.add_argument("--padding", type=int, default=0, help="Rand um jeden Ausschnitt in Pixeln")
+    parser.add_argument("--shard-size", type=int, default=0,
+                        help="Einträge pro Tar-Shard (0 = Verzeichnisbaum statt Shards)")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Threads/Prozesse")
+    parser.add_argument("--executor", choices=("process", "thread"), default="process",
+                        help="process: ganze Seiten parallel; thread: nur die Kodierung parallel")
+    parser.add_argument("--profile", help="Parameterprofil für die Erkennung")
+    args = parser.parse_args()
+
+    pages = find_export_pages(args.paths)
+    if not pages:
+        print("Fehler: Keine Bilder oder PDFs gefunden")
+        sys.exit(1)
+
+    detector_params = load_detector_profile(args.profile) if args.profile else None
+    writer = ShardWriter(args.output, args.shard_size) if args.shard_size > 0 else DirectoryWriter(args.output)
+
+    start = time.perf_counter()
+    try:
+        count = export_bays(pages, writer, args.format, args.quality, args.padding, args.workers,
+                            args.executor, detector_params)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{count} Ausschnitt(e) aus {len(pages)} Seite(n) in {elapsed:.1f} s exportiert "
+          f"({count / elapsed if elapsed else 0:.0f} pro Sekunde) nach {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Vergleich zweier Revisionen eines Parkhausplans (PDF).
+
+Statt jede neue Revision vollständig neu zu erkennen, werden zuerst geänderte Seiten über
+einen Hash eines niedrig aufgelösten Renderings gefunden. Nur geänderte Seiten - bzw. bei
+vorhandenem alten PDF nur die geänderten Bereiche - werden neu erkannt. Ausgegeben werden hinzugefügte, entfernte und verschobene Rechtecke.
+
+Aufruf:
+  # Ergebnisdatei für eine Revision erstellen (vollständige Erkennung)
+  python revision_diff.py baseline plan_v1.pdf -o plan_v1.result.json
+
+  # Neue Revision gegen das vorherige Ergebnis vergleichen
+  python revision_diff.py diff plan_v1.result.json plan_v2.pdf [--old-pdf plan_v1.pdf]
+                          -o diff.json [--result-out plan_v2.result.json]
+
+Optionen für beide Modi: --profile <profil.json> (Erkennungsparameter, siehe tune.py)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+from test import (SpatialIndex, convert_pdf_page_to_image, detect_rectangles_in_region, load_detector_profile,
+                  pil_to_opencv, process_image_for_rectangles)
+
+DETECTION_DPI = 200
+PREVIEW_DPI = 50
+
+def page_content_hash(doc, page):
+    """
+    Hash über den Inhalts-Stream einer Seite, ihre Größe und eingebettete Bilder.
+
+    Form-XObjects und Ressourcen wie Schriften sind nicht enthalten; der Hash dient nur dazu,
+    die alte PDF-Revision einer Ergebnisdatei wiederzuerkennen. Ob sich eine Seite geändert hat,
+    entscheidet page_pixel_hash.
+
+    :param doc: Geöffnetes fitz-Dokument
+    :param page: fitz-Seite
+    :return: Hex-Digest
+    """
+    digest = hashlib.sha1()
+    digest.update(repr(tuple(page.rect)).encode())
+    digest.update(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+def render_preview(page, dpi=PREVIEW_DPI):
+    """Rendert eine Seite niedrig aufgelöst als Graustufen-Array"""
+    zoom = dpi / 72.0
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+
+def page_pixel_hash(preview):
+    """Hash über das niedrig aufgelöste Rendering einer Seite"""
+    return hashlib.sha1(preview.tobytes()).hexdigest()
+
+def changed_regions(old_preview, new_preview, threshold=32, margin=100):
+    """
+    Findet geänderte Bereiche durch Vergleich zweier niedrig aufgelöster Renderings.
+
+    :param old_preview: Graustufen-Rendering der alten Seite
+    :param new_preview: Graustufen-Rendering der neuen Seite
+    :param threshold: Minimale Helligkeitsdifferenz eines geänderten Pixels
+    :param margin: Rand in Pixeln (Erkennungsauflösung) um jeden Bereich, damit angeschnittene Rechtecke vollständig erfasst werden
+    :return: Liste von Bereichen (x_min, y_min, x_max, y_max) in Erkennungsauflösung,
+             oder None wenn die Seitengrößen nicht übereinstimmen
+    """
+    if old_preview.shape != new_preview.shape:
+        return None
+
+    mask = (cv2.absdiff(old_preview, new_preview) > threshold).astype(np.uint8)
+    if not mask.any():
+        return []
+
+    # Nahe beieinander liegende Änderungen zu einem Bereich verbinden
+    mask = cv2.dilate(mask, np.ones((5, 5), np.uint8))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+
+    scale = DETECTION_DPI / PREVIEW_DPI
+    regions = []
+    for label in range(1, count):
+        x, y, w, h = stats[label][:4]
+        regions.append((int(x * scale) - margin, int(y * scale) - margin,
+                        int((x + w) * scale) + margin, int((y + h) * scale) + margin))
+    return regions
+
+def build_revision_result(pdf_path, detector_params=None):
+    """
+    Erkennt alle Seiten eines PDFs und speichert Rechtecke zusammen mit den Seiten-Hashes.
+
+    :param pdf_path: Pfad zur PDF-Datei
+    :param detector_params: Parameter für process_image_for_rectangles
+    :return: Ergebnis-Dict (Eingabe für diff_revision)
+    """
+    detector_params = detector_params or {}
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for page_num, page in enumerate(doc):
+            img = pil_to_opencv(convert_pdf_page_to_image(pdf_path, page_num, DETECTION_DPI))
+            rectangles = process_image_for_rectangles(img, **detector_params)
+            pages.append({
+                "page": page_num + 1,
+                "content_hash": page_content_hash(doc, page),
+                "pixel_hash": page_pixel_hash(render_preview(page)),
+                "rectangles": [[int(v) for v in rect] for rect in rectangles],
+            })
+            print(f"Seite {page_num + 1}: {len(rectangles)} Rechteck(e) erkannt")
+
+    return {"source": os.path.abspath(pdf_path), "dpi": DETECTION_DPI, "params": detector_params,
+            "pages": pages, "export_timestamp": int(time.time())}
+
+def match_revision_rectangles(old_rectangles, new_rectangles, tolerance=2, max_move=200, size_tolerance=3):
+    """
+    Paart Rechtecke zweier Revisionen über einen räumlichen Index.
+
+    Identische Rechtecke (bis auf tolerance) gelten als unverändert. Übrige Rechtecke gleicher
+    Größe innerhalb von max_move Pixeln gelten als verschoben (nächster Kandidat zuerst).
+
+    :param old_rectangles: Rechtecke der alten Revision
+    :param new_rectangles: Rechtecke der neuen Revision
+    :return: Dict mit "added", "removed", "moved" (Liste von {"from", "to"}) und "unchanged" (Anzahl)
+    """
+    index = SpatialIndex(old_rectangles, cell_size=max(max_move, 1))
+    used_old = set()
+    unmatched_new = []
+    unchanged = 0
+
+    # Unveränderte Rechtecke
+    for rect in new_rectangles:
+        match = None
+        for i in index.query(rect):
+            if i not in used_old and all(abs(a - b) <= tolerance for a, b in zip(old_rectangles[i], rect)):
+                match = i
+                break
+        if match is None:
+            unmatched_new.append(rect)
+        else:
+            used_old.add(match)
+            unchanged += 1
+
+    # Verschobene Rechtecke: gleiche Größe, nächster Mittelpunkt
+    added = []
+    moved = []
+    for rect in unmatched_new:
+        x1, y1, x2, y2 = rect
+        search = (x1 - max_move, y1 - max_move, x2 + max_move, y2 + max_move)
+        best, best_dist = None, None
+        for i in index.query(search):
+            if i in used_old:
+                continue
+            ox1, oy1, ox2, oy2 = old_rectangles[i]
+            if abs((ox2 - ox1) - (x2 - x1)) > size_tolerance or abs((oy2 - oy1) - (y2 - y1)) > size_tolerance:
+                continue
+            dist = abs(ox1 - x1) + abs(oy1 - y1)
+            if dist <= max_move and (best is None or dist < best_dist):
+                best, best_dist = i, dist
+        if best is None:
+            added.append(list(rect))
+        else:
+            used_old.add(best)
+            moved.append({"from": list(old_rectangles[best]), "to": list(rect)})
+
+    removed = [list(rect) for i, rect in enumerate(old_rectangles) if i not in used_old]
+    return {"added": added, "removed": removed, "moved": moved, "unchanged": unchanged}
+
+def diff_revision(previous_result, new_pdf_path, old_pdf_path=None, detector_params=None):
+    """
+    Vergleicht eine neue PDF-Revision mit dem Ergebnis der vorherigen Revision.
+
+    :param previous_result: Ergebnis-Dict von build_revision_result (bzw. einem früheren diff_revision)
+    :param new_pdf_path: Pfad zur neuen PDF-Revision
+    :param old_pdf_path: Optional Pfad zur alten PDF-Revision; ermöglicht Erkennung nur in geänderten Bereichen.
+                         Seiten, deren Hashes nicht zur vorherigen Ergebnisdatei passen, werden vollständig erkannt
+    :param detector_params: Parameter für process_image_for_rectangles
+    :return: (Diff-Dict, neues Ergebnis-Dict für die nächste Revision)
+    """
+    detector_params = detector_params or previous_result.get("params") or {}
+    previous_pages = {p["page"]: p for p in previous_result.get("pages", [])}
+    # Dieselbe Datei als alte Revision hätte keine Unterschiede und damit keine Bereiche
+    if old_pdf_path and os.path.abspath(old_pdf_path) == os.path.abspath(new_pdf_path):
+        old_pdf_path = None
+    old_doc = fitz.open(old_pdf_path) if old_pdf_path else None
+
+    diff_pages = []
+    result_pages = []
+    try:
+        with fitz.open(new_pdf_path) as doc:
+            for page_num, page in enumerate(doc):
+                page_label = page_num + 1
+                previous = previous_pages.get(page_label)
+                content_hash = page_content_hash(doc, page)
+                # Der Inhalts-Hash erfasst keine Form-XObjects, daher entscheidet immer das Rendering
+                preview = render_preview(page)
+                pixel_hash = page_pixel_hash(preview)
+
+                status = "unchanged"
+                regions = None
+                if previous is None:
+                    status = "added"
+                elif pixel_hash != previous["pixel_hash"]:
+                    status = "changed"
+                    old_preview = _previous_page_preview(old_doc, page_num, previous)
+                    if old_preview is not None:
+                        regions = changed_regions(old_preview, preview)
+                    if not regions:
+                        # Keine verwertbaren Bereiche trotz geänderter Seite: vollständig neu erkennen
+                        regions = None
+
+                if status == "unchanged":
+                    rectangles = [tuple(rect) for rect in previous["rectangles"]]
+                elif regions is None:
+                    img = pil_to_opencv(convert_pdf_page_to_image(new_pdf_path, page_num, DETECTION_DPI))
+                    rectangles = [tuple(int(v) for v in rect)
+                                  for rect in process_image_for_rectangles(img, **detector_params)]
+                else:
+                    rectangles = _redetect_regions(page, previous["rectangles"], regions, detector_params)
+
+                old_rectangles = [tuple(rect) for rect in previous["rectangles"]] if previous else []
+                changes = match_revision_rectangles(old_rectangles, rectangles)
+                changes.update(page=page_label, status=status)
+                if regions is not None:
+                    changes["regions"] = [list(region) for region in regions]
+                diff_pages.append(changes)
+                result_pages.append({
+                    "page": page_label,
+                    "content_hash": content_hash,
+                    "pixel_hash": pixel_hash,
+                    "rectangles": [list(rect) for rect in rectangles],
+                })
+                print(f"Seite {page_label}: {status} (+{len(changes['added'])} / -{len(changes['removed'])} / "
+                      f"verschoben {len(changes['moved'])})")
+
+            # Seiten, die in der neuen Revision fehlen
+            for page_label in sorted(previous_pages):
+                if page_label > len(doc):
+                    old_rectangles = previous_pages[page_label]["rectangles"]
+                    diff_pages.append({"page": page_label, "status": "removed", "added": [],
+                                       "removed": old_rectangles, "moved": [], "unchanged": 0})
+    finally:
+        if old_doc is not None:
+            old_doc.close()
+
+    diff = {"previous": previous_result.get("source"), "new": os.path.abspath(new_pdf_path),
+            "pages": diff_pages, "export_timestamp": int(time.time())}
+    new_result = {"source": os.path.abspath(new_pdf_path), "dpi": DETECTION_DPI, "params": detector_params,
+                  "pages": result_pages, "export_timestamp": int(time.time())}
+    return diff, new_result
+
+def _previous_page_preview(old_doc, page_num, previous):
+    """
+    Rendert die Seite der alten PDF-Revision, sofern sie zur Ergebnisdatei passt.
+
+    :param old_doc: Geöffnetes fitz-Dokument der alten Revision oder None
+    :param page_num: Seitennummer (0-basiert)
+    :param previous: Seiteneintrag der vorherigen Ergebnisdatei
+    :return: Graustufen-Rendering oder None, wenn die alte Seite fehlt oder nicht zum Ergebnis passt
+    """
+    if old_doc is None or page_num >= len(old_doc):
+        return None
+    old_page = old_doc[page_num]
+    if page_content_hash(old_doc, old_page) != previous["content_hash"]:
+        return None
+    old_preview = render_preview(old_page)
+    if page_pixel_hash(old_preview) != previous["pixel_hash"]:
+        return None
+    return old_preview
+
+def render_region(page, region, dpi=DETECTION_DPI):
+    """
+    Rendert nur einen Bereich einer Seite, damit der Aufwand mit der Größe der Änderung wächst.
+
+    :param page: fitz-Seite
+    :param region: Bereich (x_min, y_min, x_max, y_max) in Pixeln der Erkennungsauflösung
+    :param dpi: Erkennungsauflösung
+    :return: (OpenCV-Bild (BGR), (x, y) Position der linken oberen Ecke in Seitenpixeln)
+    """
+    zoom = dpi / 72.0
+    # clip ist wie page.rect in Punkten der gedrehten Seite angegeben
+    clip = fitz.Rect(region) * fitz.Matrix(1 / zoom, 1 / zoom)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+    rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), (pix.x, pix.y)
+
+def _redetect_regions(page, previous_rectangles, regions, detector_params):
+    """
+    Erkennt nur in geänderten Bereichen neu; Rechtecke außerhalb bleiben aus der vorherigen Revision.
+
+    :param page: fitz-Seite der neuen Revision
+    :return: Liste von Rechtecken der Seite
+    """
+    zoom = DETECTION_DPI / 72.0
+    page_size = (page.rect * fitz.Matrix(zoom, zoom)).irect
+    image_size = (page_size.width, page_size.height)
+
+    index = SpatialIndex(previous_rectangles)
+    stale = set()
+    for region in regions:
+        stale.update(index.query(region))
+
+    detected_per_region = []
+    for region in regions:
+        region_img, origin = render_region(page, region)
+        detected_per_region.append(detect_rectangles_in_region(region_img, region, origin=origin,
+                                                               image_size=image_size, **detector_params))
+    detected_index = SpatialIndex([rect for detected in detected_per_region for rect in detected])
+
+    # Rechtecke außerhalb der Bereiche bleiben unverändert erhalten (auch doppelte Einträge der Erkennung).
+    # Rechtecke, die einen Bereich nur anschneiden, bleiben erhalten, falls dort nichts erkannt wird.
+    rectangles = []
+    for i, rect in enumerate(previous_rectangles):
+        if i in stale:
+            rx1, ry1, rx2, ry2 = rect
+            inside = any(rx1 >= x1 and ry1 >= y1 and rx2 <= x2 and ry2 <= y2 for x1, y1, x2, y2 in regions)
+            if inside or detected_index.query(rect):
+                continue
+        rectangles.append(tuple(rect))
+
+    # Neue Erkennungen nur gegen Erhaltenes und frühere (überlappende) Bereiche abgleichen
+    known = set(rectangles)
+    for detected in detected_per_region:
+        new = [rect for rect in detected if rect not in known]
+        rectangles.extend(new)
+        known.update(new)
+    return rectangles
+
+def main():
+    parser = argparse.ArgumentParser(description="Vergleicht Revisionen eines Parkhausplans")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    baseline = subparsers.add_parser("baseline", help="Ergebnisdatei für eine Revision erstellen")
+    baseline.add_argument("pdf_path")
+    baseline.add_argument("-o", "--output", required=True, help="Pfad der Ergebnisdatei")
+    baseline.add_argument("--profile", help="Parameterprofil für die Erkennung")
+
+    diff = subparsers.add_parser("diff", help="Neue Revision gegen ein vorheriges Ergebnis vergleichen")
+    diff.add_argument("previous_result", help="Ergebnisdatei der vorherigen Revision")
+    diff.add_argument("pdf_path", help="Neue PDF-Revision")
+    diff.add_argument("--old-pdf", help="Alte PDF-Revision (Standard: Quelle aus der Ergebnisdatei, falls vorhanden)")
+    diff.add_argument("-o", "--output", required=True, help="Pfad der Diff-Datei")
+    diff.add_argument("--result-out", help="Ergebnisdatei der neuen Revision für den nächsten Vergleich")
+    diff.add_argument("--profile", help="Parameterprofil für die Erkennung")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pdf_path):
+        print(f"Fehler: Datei nicht gefunden: {args.pdf_path}")
+        sys.exit(1)
+    detector_params = load_detector_profile(args.profile) if args.profile else None
+
+    if args.mode == "baseline":
+        result = build_revision_result(args.pdf_path, detector_params)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Ergebnis gespeichert in: {args.output}")
+        return
+
+    with open(args.previous_result, 'r', encoding='utf-8') as f:
+        previous_result = json.load(f)
+
+    # Die gespeicherte Quelle ist nur brauchbar, wenn die neue Revision nicht dieselbe Datei überschrieben hat
+    old_pdf = args.old_pdf
+    source = previous_result.get("source")
+    if (old_pdf is None and source and os.path.exists(source)
+            and os.path.abspath(source) != os.path.abspath(args.pdf_path)):
+        old_pdf = source
+
+    start = time.perf_counter()
+    diff_result, new_result = diff_revision(previous_result, args.pdf_path, old_pdf, detector_params)
+    print(f"Vergleich abgeschlossen in {time.perf_counter() - start:.2f} s")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(diff_result, f, indent=2, ensure_ascii=False)
+    print(f"Diff gespeichert in: {args.output}")
+
+    if args.result_out:
+        with open(args.result_out, 'w', encoding='utf-8') as f:
+            json.dump(new_result, f, indent=2, ensure_ascii=False)
+        print(f"Ergebnis der neuen Revision gespeichert in: {args.result_out}")
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,580 @@ from PIL import Image, ImageTk
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import json
+import queue
+import threading
+from collections import Counter, deque
+
+try:
+    import resource  # Nur unter Unix verfügbar
+except ImportError:
+    resource = None
+
+def apply_edit_command(rectangles, command):
+    """
+    Wendet einen Bearbeitungsbefehl auf eine Rechteckliste an (in-place).
+
+    Befehle sind Tupel:
+      ("add", index, rect)      - Rechteck an Position index einfügen
+      ("remove", index, rect)   - Rechteck an Position index entfernen
+      ("move", index, dx, dy)   - Rechteck an Position index verschieben
+      ("group", commands)       - Mehrere Befehle nacheinander ausführen
+
+    :param rectangles: Liste von Rechtecken (x1, y1, x2, y2)
+    :param command: Befehlstupel
+    """
+    kind = command[0]
+    if kind == "add":
+        rectangles.insert(command[1], command[2])
+    elif kind == "remove":
+        del rectangles[command[1]]
+    elif kind == "move":
+        _, index, dx, dy = command
+        x1, y1, x2, y2 = rectangles[index]
+        rectangles[index] = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+    elif kind == "group":
+        for sub_command in command[1]:
+            apply_edit_command(rectangles, sub_command)
+    else:
+        raise ValueError(f"Unbekannter Befehl: {kind}")
+
+def invert_edit_command(command):
+    """
+    Liefert den Befehl, der einen Bearbeitungsbefehl rückgängig macht.
+
+    :param command: Befehlstupel wie bei apply_edit_command
+    :return: Inverses Befehlstupel
+    """
+    kind = command[0]
+    if kind == "add":
+        return ("remove", command[1], command[2])
+    if kind == "remove":
+        return ("add", command[1], command[2])
+    if kind == "move":
+        return ("move", command[1], -command[2], -command[3])
+    if kind == "group":
+        return ("group", tuple(invert_edit_command(c) for c in reversed(command[1])))
+    raise ValueError(f"Unbekannter Befehl: {kind}")
+
+def diff_edit_command(old_rectangles, new_rectangles):
+    """
+    Berechnet einen Gruppenbefehl, der old_rectangles in den Inhalt von new_rectangles überführt.
+
+    Unveränderte Rechtecke bleiben in ihrer Reihenfolge erhalten, so dass der Befehl nur
+    die tatsächlich entfernten und hinzugefügten Rechtecke enthält.
+
+    :param old_rectangles: Bisherige Rechteckliste
+    :param new_rectangles: Gewünschte Rechteckliste
+    :return: ("group", commands)
+    """
+    remaining = Counter(new_rectangles)
+    removed_indices = []
+    for i, rect in enumerate(old_rectangles):
+        if remaining[rect] > 0:
+            remaining[rect] -= 1
+        else:
+            removed_indices.append(i)
+
+    # Von hinten entfernen, damit die Indizes gültig bleiben
+    commands = [("remove", i, old_rectangles[i]) for i in reversed(removed_indices)]
+
+    # Was in "remaining" übrig ist, kommt in old_rectangles nicht vor und wird angehängt
+    kept_count = len(old_rectangles) - len(removed_indices)
+    for rect in new_rectangles:
+        if remaining[rect] > 0:
+            remaining[rect] -= 1
+            commands.append(("add", kept_count, rect))
+            kept_count += 1
+
+    return ("group", tuple(commands))
+
+class EditHistory:
+    """
+    Undo/Redo-Verlauf als Befehlsprotokoll.
+
+    Gespeichert werden nur die Änderungen (Deltas), nicht Kopien der gesamten Rechteckliste.
+    Der Speicherbedarf wächst daher mit dem Umfang der Bearbeitungen.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.undo_stack = deque(maxlen=max_entries)
+        self.redo_stack = []
+
+    def push(self, command):
+        """Protokolliert einen bereits ausgeführten Befehl"""
+        if command[0] == "group" and not command[1]:
+            return
+        self.undo_stack.append(command)
+        self.redo_stack.clear()
+
+    def undo(self, rectangles):
+        """Macht den letzten Befehl rückgängig. Gibt den ausgeführten Befehl zurück oder None."""
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        inverse = invert_edit_command(command)
+        apply_edit_command(rectangles, inverse)
+        self.redo_stack.append(command)
+        return inverse
+
+    def redo(self, rectangles):
+        """Stellt den zuletzt rückgängig gemachten Befehl wieder her. Gibt den ausgeführten Befehl zurück oder None."""
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        apply_edit_command(rectangles, command)
+        self.undo_stack.append(command)
+        return command
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+def edit_command_to_json(command):
+    """Wandelt einen Bearbeitungsbefehl in eine JSON-serialisierbare Liste um"""
+    kind = command[0]
+    if kind in ("add", "remove"):
+        return [kind, int(command[1]), [int(float(v)) for v in command[2]]]
+    if kind == "move":
+        return [kind, int(command[1]), int(float(command[2])), int(float(command[3]))]
+    if kind == "group":
+        return [kind, [edit_command_to_json(c) for c in command[1]]]
+    raise ValueError(f"Unbekannter Befehl: {kind}")
+
+def edit_command_from_json(data):
+    """Wandelt einen mit edit_command_to_json serialisierten Befehl zurück in ein Befehlstupel"""
+    kind = data[0]
+    if kind in ("add", "remove"):
+        return (kind, data[1], tuple(data[2]))
+    if kind == "move":
+        return (kind, data[1], data[2], data[3])
+    if kind == "group":
+        return (kind, tuple(edit_command_from_json(c) for c in data[1]))
+    raise ValueError(f"Unbekannter Befehl: {kind}")
+
+class SessionJournal:
+    """
+    Absturzsicheres Auto-Speichern einer Editor-Sitzung.
+
+    Jeder Bearbeitungsbefehl wird von einem Hintergrund-Thread an eine Journal-Datei angehängt
+    (eine JSON-Zeile pro Befehl, fsync gebündelt). In regelmäßigen Abständen wird das Journal zu
+    einem Snapshot verdichtet. Der Tk-Event-Loop legt Befehle nur in eine Queue und blockiert nie.
+    """
+
+    def __init__(self, base_path, rectangles=(), fsync_interval=1.0, compact_every=500, predecessor=None):
+        """
+        :param base_path: Pfad der bearbeiteten Datei; Journal und Snapshot werden daneben abgelegt
+        :param rectangles: Aktueller Stand der Rechtecke zu Beginn der Sitzung
+        :param fsync_interval: Maximaler Abstand in Sekunden zwischen zwei fsync-Aufrufen
+        :param compact_every: Anzahl Journal-Einträge, nach denen ein neuer Snapshot geschrieben wird
+        :param predecessor: Vorheriges, mit close(wait=False) beendetes Journal; der Schreib-Thread
+                            wartet auf dessen Abschluss, bevor er Dateien anfasst
+        """
+        self.base_path = os.path.abspath(base_path)
+        self.journal_path, self.snapshot_path = self.session_paths(base_path)
+        self.predecessor = predecessor
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        
+        # Der Schreib-Thread führt eine eigene Kopie der Rechtecke, um Snapshots ohne Zugriff auf den Editor zu erstellen
+        self.mirror = [tuple(rect) for rect in rectangles]
+        self.seq = 0
+        self.entries_since_compact = 0
+        self.queue = queue.Queue()
+        self.journal_file = None
+        
+        self.thread = threading.Thread(target=self._run, name="SessionJournal", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def session_paths(base_path):
+        """
+        :param base_path: Pfad der bearbeiteten Datei
+        :return: (Journal-Pfad, Snapshot-Pfad)
+        """
+        return f"{base_path}.session.journal", f"{base_path}.session.json"
+
+    @staticmethod
+    def load(base_path):
+        """
+        Stellt eine Sitzung aus Snapshot und Journal-Ende wieder her.
+
+        :param base_path: Pfad der bearbeiteten Datei
+        :return: Liste von Rechtecken oder None wenn keine Sitzung vorhanden ist
+        """
+        journal_path, snapshot_path = SessionJournal.session_paths(base_path)
+        if not os.path.exists(snapshot_path):
+            return None
+        
+        try:
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warnung: Snapshot konnte nicht gelesen werden: {e}")
+            return None
+        
+        rectangles = [tuple(rect) for rect in snapshot.get("rectangles", [])]
+        snapshot_seq = snapshot.get("seq", 0)
+        
+        if os.path.exists(journal_path):
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        if entry["seq"] <= snapshot_seq:
+                            continue
+                        apply_edit_command(rectangles, edit_command_from_json(entry["command"]))
+                    except (ValueError, KeyError, IndexError) as e:
+                        # Unvollständige letzte Zeile nach einem Absturz
+                        print(f"Warnung: Journal ab fehlerhaftem Eintrag ignoriert: {e}")
+                        break
+        
+        return rectangles
+
+    def append(self, command):
+        """Übergibt einen ausgeführten Befehl an den Schreib-Thread (nicht blockierend)"""
+        self.queue.put(("command", command))
+
+    def close(self, wait=True, timeout=5.0):
+        """
+        Schreibt ausstehende Einträge, verdichtet zu einem Snapshot und beendet den Thread.
+        
+        :param wait: Auf das Ende des Schreib-Threads warten; mit False kehrt der Aufruf sofort zurück
+                     und das Verdichten läuft im Hintergrund weiter (z.B. beim Dateiwechsel im Tk-Thread)
+        :param timeout: Maximale Wartezeit in Sekunden
+        """
+        self.queue.put(("close", None))
+        if wait:
+            self.thread.join(timeout)
+
+    def _run(self):
+        # Ein noch laufendes vorheriges Journal kann dieselben Dateien verdichten
+        if self.predecessor is not None:
+            self.predecessor.thread.join()
+            self.predecessor = None
+        
+        # Ausgangsstand sichern und Journal öffnen, bevor der erste Befehl geschrieben wird
+        try:
+            self._compact()
+        except Exception as e:
+            print(f"Fehler beim Auto-Speichern: {e}")
+        
+        last_fsync = time.time()
+        dirty = False
+        running = True
+        
+        while running:
+            try:
+                batch = [self.queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            
+            # Alle bereits wartenden Einträge in einem Durchgang schreiben
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                compact = False
+                for kind, command in batch:
+                    if kind == "command":
+                        self._write_command(command)
+                        dirty = True
+                    elif kind == "close":
+                        compact = True
+                        running = False
+                
+                if self.entries_since_compact >= self.compact_every:
+                    compact = True
+                
+                if compact:
+                    self._compact()
+                    dirty = False
+                    last_fsync = time.time()
+                elif dirty and time.time() - last_fsync >= self.fsync_interval:
+                    self.journal_file.flush()
+                    os.fsync(self.journal_file.fileno())
+                    dirty = False
+                    last_fsync = time.time()
+            except Exception as e:
+                print(f"Fehler beim Auto-Speichern: {e}")
+        
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+
+    def _write_command(self, command):
+        apply_edit_command(self.mirror, command)
+        self.seq += 1
+        self.entries_since_compact += 1
+        entry = {"seq": self.seq, "command": edit_command_to_json(command)}
+        self.journal_file.write(json.dumps(entry) + "\n")
+
+    def _compact(self):
+        """Schreibt den aktuellen Stand atomar als Snapshot und leert das Journal"""
+        data = {
+            "rectangles": [[int(float(v)) for v in rect] for rect in self.mirror],
+            "seq": self.seq,
+            "export_timestamp": int(time.time())
+        }
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        
+        # Einträge bis einschließlich seq sind jetzt im Snapshot enthalten
+        if self.journal_file is not None:
+            self.journal_file.close()
+        self.journal_file = open(self.journal_path, 'w', encoding='utf-8')
+        self.entries_since_compact = 0
+
+class PageImageStore:
+    """
+    Hält das Bild einer geöffneten Seite innerhalb eines Speicherbudgets.
+
+    Resident ist genau eine schreibgeschützte Arbeitskopie (BGR), die von Anzeige und Erkennung
+    gemeinsam genutzt wird. Übersteigt die volle Auflösung das Budget, wird die Arbeitskopie
+    direkt in reduzierter Auflösung (1/2, 1/4, 1/8) gerendert bzw. dekodiert. Die volle Auflösung
+    wird nur für den Export bei Bedarf neu erzeugt. Alle Koordinaten nach außen sind in voller Auflösung.
+
+    Nur JPEG wird von OpenCV direkt verkleinert dekodiert. Andere Formate (z.B. PNG) werden zuerst
+    vollständig dekodiert und danach verkleinert; die volle Auflösung ist dann kurzzeitig im Speicher
+    und wird in peak_bytes mitgezählt.
+    """
+
+    LEVELS = (1, 2, 4, 8)
+
+    def __init__(self, file_path, memory_budget_mb=None, dpi=200, page_num=0):
+        """
+        :param file_path: Pfad zum Bild oder PDF
+        :param memory_budget_mb: Maximaler Speicher der Arbeitskopie in MB (None = volle Auflösung)
+        :param dpi: Auflösung für PDF-Seiten
+        :param page_num: Seitennummer bei PDFs (0-basiert)
+        """
+        self.file_path = file_path
+        self.dpi = dpi
+        self.page_num = page_num
+        self.display_cache = None  # (Zielgröße, Interpolation, PIL-Bild)
+        self.source_format = None
+        
+        full_width, full_height = self._source_size()
+        self.full_size = (full_width, full_height)
+        
+        # Größte Stufe wählen, deren Arbeitskopie ins Budget passt
+        self.level = self.LEVELS[-1]
+        for level in self.LEVELS:
+            if memory_budget_mb is None or (full_width // level) * (full_height // level) * 3 <= memory_budget_mb * 1024 * 1024:
+                self.level = level
+                break
+        
+        self.working = self._load(self.level)
+        self.working.flags.writeable = False
+        self.scale = self.working.shape[1] / full_width
+        self.peak_bytes = self.resident_bytes()
+        if self.level > 1 and self.source_format not in (None, "JPEG"):
+            # Reduziertes Dekodieren gibt es nur für JPEG, sonst lag das volle Bild kurz im Speicher
+            self._track_peak(full_width * full_height * 3)
+
+    def _source_size(self):
+        if is_pdf_file(self.file_path):
+            # Dieselbe Rundung wie get_pixmap, damit Stufe 1 genau den Maßstab 1.0 ergibt
+            zoom = self.dpi / 72.0
+            with fitz.open(self.file_path) as doc:
+                bounds = (doc[self.page_num].rect * fitz.Matrix(zoom, zoom)).irect
+            return bounds.width, bounds.height
+        # Nur den Header lesen, nicht das ganze Bild dekodieren
+        with Image.open(self.file_path) as img:
+            self.source_format = img.format
+            width, height = img.size
+            orientation = img.getexif().get(0x0112, 1)
+        # cv2.imread wendet die EXIF-Orientierung an; bei 90°/270° sind Breite und Höhe vertauscht
+        if orientation in (5, 6, 7, 8):
+            width, height = height, width
+        return width, height
+
+    def _load(self, level):
+        """Erzeugt das Bild in der Auflösung 1/level ohne Umweg über die volle Auflösung"""
+        if is_pdf_file(self.file_path):
+            zoom = self.dpi / 72.0 / level
+            with fitz.open(self.file_path) as doc:
+                pix = doc[self.page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+            return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        
+        flags = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}[level]
+        img = cv2.imread(self.file_path, flags)
+        if img is None:
+            raise ValueError(f"Konnte Bild nicht laden: {self.file_path}")
+        return img
+
+    def resident_bytes(self):
+        """Aktuell vom Seitenbild belegter Speicher in Bytes"""
+        total = self.working.nbytes
+        if self.display_cache is not None:
+            width, height = self.display_cache[2].size
+            total += width * height * 3
+        return total
+
+    def _track_peak(self, extra_bytes=0):
+        self.peak_bytes = max(self.peak_bytes, self.resident_bytes() + extra_bytes)
+
+    def render(self, final_scale, interpolation=cv2.INTER_AREA):
+        """
+        Liefert das Anzeigebild für einen Maßstab relativ zur vollen Auflösung.
+        Skaliert wird direkt aus der Arbeitskopie, umgewandelt wird nur das kleine Ergebnis.
+        
+        :param final_scale: Anzeigemaßstab bezogen auf die volle Auflösung
+        :param interpolation: OpenCV-Interpolation
+        :return: PIL-Bild (RGB)
+        """
+        full_width, full_height = self.full_size
+        size = (max(1, int(full_width * final_scale)), max(1, int(full_height * final_scale)))
+        if self.display_cache is not None and self.display_cache[:2] == (size, interpolation):
+            return self.display_cache[2]
+        
+        # Alten Cache vor dem Erzeugen des neuen freigeben
+        self.display_cache = None
+        resized = cv2.resize(self.working, size, interpolation=interpolation)
+        image = Image.fromarray(cv2.cvtColor(resized, cv2.COLOR_BGR2RGB))
+        self.display_cache = (size, interpolation, image)
+        self._track_peak()
+        return image
+
+    def detect(self, region=None, **detector_params):
+        """
+        Erkennt Rechtecke auf der Arbeitskopie (ohne Kopie des Bildes).
+        
+        :param region: Optionaler Bereich (x_min, y_min, x_max, y_max) in voller Auflösung
+        :param detector_params: Parameter für process_image_for_rectangles (in voller Auflösung)
+        :return: Liste von Rechtecken in voller Auflösung
+        """
+        params = dict(detector_params)
+        # Die Mindestfläche bezieht sich auf die volle Auflösung
+        params["min_area"] = params.get("min_area", 1000) * self.scale * self.scale
+        
+        if region is None:
+            detected = process_image_for_rectangles(self.working, draw=False, **params)
+        else:
+            detected = detect_rectangles_in_region(self.working, tuple(v * self.scale for v in region), **params)
+        
+        return [tuple(int(round(float(v) / self.scale)) for v in rect) for rect in detected]
+
+    def materialize_full(self):
+        """
+        Liefert eine beschreibbare Kopie in voller Auflösung (z.B. für den Export).
+        Bei reduzierter Arbeitskopie wird die Seite dafür neu gerendert bzw. dekodiert.
+        """
+        full = self.working.copy() if self.level == 1 else self._load(1)
+        self._track_peak(full.nbytes)
+        return full
+
+    def memory_report(self):
+        """Kurzer Bericht über den Speicherbedarf der Seite"""
+        report = (f"Auflösung 1/{self.level}, resident {self.resident_bytes() / (1024 * 1024):.1f} MB, "
+                  f"Spitze {self.peak_bytes / (1024 * 1024):.1f} MB")
+        if resource is not None:
+            # ru_maxrss ist unter Linux in KB angegeben
+            report += f", Prozess max. {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB"
+        return report
+
+class FrameScheduler:
+    """
+    Fasst Neuzeichnen-Anforderungen zu höchstens einem Frame pro Anzeigeintervall zusammen.
+
+    Ereignisse (Ziehen, Mausrad) melden nur, welche Teile neu zu zeichnen sind. Gezeichnet wird
+    gesammelt im nächsten Frame über after/after_idle. Optional wird nach einer Ruhezeit ohne
+    weitere Eingaben ein hochwertiges Rendering ausgelöst. Frame-Zeiten werden für Messungen protokolliert.
+    """
+
+    def __init__(self, widget, render, settle=None, frame_ms=16, settle_ms=150):
+        """
+        :param widget: Tk-Widget für after/after_idle
+        :param render: Funktion, die mit der Menge der angeforderten Teile aufgerufen wird
+        :param settle: Funktion für das hochwertige Rendering nach Ende der Eingaben
+        :param frame_ms: Minimaler Abstand zwischen zwei Frames in Millisekunden
+        :param settle_ms: Ruhezeit in Millisekunden bis zum hochwertigen Rendering
+        """
+        self.widget = widget
+        self.render = render
+        self.settle = settle
+        self.frame_ms = frame_ms
+        self.settle_ms = settle_ms
+        self.pending = set()
+        self.frame_job = None
+        self.settle_job = None
+        self.last_frame = 0.0
+        self.frame_times = deque(maxlen=240)
+        self.settle_times = deque(maxlen=60)
+        self.coalesced = 0  # Anforderungen, die in einen bereits geplanten Frame gefallen sind
+
+    def request(self, *parts, settle=False):
+        """
+        Fordert das Neuzeichnen der angegebenen Teile an.
+        
+        :param parts: Namen der neu zu zeichnenden Teile
+        :param settle: Nach Ende der Eingaben ein hochwertiges Rendering auslösen
+        """
+        self.pending.update(parts)
+        
+        if settle and self.settle is not None:
+            if self.settle_job is not None:
+                self.widget.after_cancel(self.settle_job)
+            self.settle_job = self.widget.after(self.settle_ms, self._run_settle)
+        
+        if self.frame_job is not None:
+            self.coalesced += 1
+            return
+        
+        delay = int(self.frame_ms - (time.perf_counter() - self.last_frame) * 1000)
+        if delay > 0:
+            self.frame_job = self.widget.after(delay, self._run_frame)
+        else:
+            self.frame_job = self.widget.after_idle(self._run_frame)
+
+    def _run_frame(self):
+        self.frame_job = None
+        parts, self.pending = self.pending, set()
+        start = time.perf_counter()
+        self.render(parts)
+        self.last_frame = time.perf_counter()
+        self.frame_times.append(self.last_frame - start)
+
+    def _run_settle(self):
+        self.settle_job = None
+        start = time.perf_counter()
+        self.settle()
+        self.settle_times.append(time.perf_counter() - start)
+
+    def cancel(self):
+        """Bricht geplante Frames ab (z.B. beim Schließen des Fensters)"""
+        for job in (self.frame_job, self.settle_job):
+            if job is not None:
+                self.widget.after_cancel(job)
+        self.frame_job = self.settle_job = None
+        self.pending.clear()
+
+    def stats(self):
+        """
+        :return: Dict mit Anzahl, Mittelwert, 95%-Perzentil und Maximum der Frame-Zeiten in ms
+                 sowie der Zeiten für das hochwertige Rendering
+        """
+        def summarize(times):
+            if not times:
+                return {"count": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+            ordered = sorted(times)
+            return {
+                "count": len(ordered),
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return {"frames": summarize(self.frame_times), "settle": summarize(self.settle_times),
+                "coalesced": self.coalesced}
 
 class RectangleEditor:
     def __init__(self, master):
@@ -17,7 +591,9 @@ class RectangleEditor:
         self.master.geometry("1200x800")
         
         # Variablen
-        self.current_image = None
+        self.current_image = None  # Schreibgeschützte Arbeitskopie aus page_store
+        self.page_store = None
+        self.memory_budget_mb = tk.IntVar(value=0)  # 0 = unbegrenzt
         self.display_image = None
         self.photo = None
         self.rectangles = []
@@ -27,12 +603,23 @@ class RectangleEditor:
         self.start_y = 0
         self.selected_rect = None
         self.drag_data = {"x": 0, "y": 0}
+        self.drag_start = None  # Position des Rechtecks beim Start einer Verschiebung
+        self.history = EditHistory()
+        self.journal = None  # Auto-Speichern der aktuellen Sitzung
+        self.detector_params = {}  # Erkennungsparameter aus einem geladenen Profil
+        self.region_mode = False  # Nächstes gezogenes Rechteck ist ein Erkennungsbereich
+        self.text_spans = []  # Textstellen der geladenen PDF-Seite für die Stellplatznummern
         self.scale_factor = 1.0
         self.zoom_factor = 1.0  # Zusätzlicher Zoom-Faktor
         self.canvas_width = 800
         self.canvas_height = 600
         
+        self.rect_item_ids = []  # Canvas-Items der Rechtecke, gleiche Reihenfolge wie self.rectangles
+        self.temp_item = None  # Canvas-Item des gerade gezogenen Rechtecks
+        
         self.setup_ui()
+        self.frames = FrameScheduler(self.master, self.render_frame, settle=self.display_image_on_canvas)
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def setup_ui(self):
         # Hauptframe
@@ -45,10 +632,15 @@ class RectangleEditor:
         
         ttk.Button(button_frame, text="Datei öffnen", command=self.open_file).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="Auto-Erkennung", command=self.auto_detect).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="Bereich erkennen", command=self.start_region_detect).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="Profil laden", command=self.load_profile).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="Rechtecke laden", command=self.load_rectangles).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="Überlappungen zusammenführen", command=self.merge_overlapping).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="Raster vervollständigen", command=self.complete_grid).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="Ausgewähltes löschen", command=self.delete_selected).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="Alle löschen", command=self.clear_all).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="Rückgängig", command=self.undo).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="Wiederholen", command=self.redo).pack(side=tk.LEFT, padx=(0, 10))
         
         # Zoom Controls
         zoom_frame = ttk.Frame(button_frame)
@@ -60,6 +652,13 @@ class RectangleEditor:
         ttk.Button(zoom_frame, text="+", command=self.zoom_in, width=3).pack(side=tk.LEFT, padx=(2, 5))
         ttk.Button(zoom_frame, text="Reset", command=self.zoom_reset, width=5).pack(side=tk.LEFT, padx=(5, 0))
         
+        # Speicherbudget für das Seitenbild (gilt beim nächsten Öffnen)
+        budget_frame = ttk.Frame(button_frame)
+        budget_frame.pack(side=tk.LEFT, padx=(10, 10))
+        ttk.Label(budget_frame, text="Speicher (MB, 0 = unbegrenzt):").pack(side=tk.LEFT)
+        ttk.Spinbox(budget_frame, from_=0, to=4096, increment=16, width=6,
+                    textvariable=self.memory_budget_mb).pack(side=tk.LEFT, padx=(5, 0))
+        
         ttk.Button(button_frame, text="Rechtecke speichern", command=self.save_rectangles).pack(side=tk.LEFT, padx=(20, 10))
         ttk.Button(button_frame, text="Bild mit Rechtecken speichern", command=self.save_annotated_image).pack(side=tk.LEFT, padx=(0, 10))
         
@@ -93,6 +692,11 @@ class RectangleEditor:
         self.canvas.bind("<MouseWheel>", self.on_mousewheel)  # Mouse wheel zoom
         self.canvas.focus_set()  # Fokus für Tastaturereignisse
         
+        # Tastenkürzel für Undo/Redo
+        self.master.bind("<Control-z>", lambda event: self.undo())
+        self.master.bind("<Control-y>", lambda event: self.redo())
+        self.master.bind("<F12>", lambda event: self.show_frame_stats())
+        
         # Instruction Label
         instruction_text = ("Anweisungen:\n"
                           "• Linke Maustaste gedrückt halten und ziehen: Neues Rechteck zeichnen\n"
@@ -100,9 +704,13 @@ class RectangleEditor:
                           "• Ausgewähltes Rechteck verschieben: Ziehen mit gedrückter linker Maustaste\n"
                           "• Button 'Ausgewähltes löschen': Löscht das aktuell ausgewählte (rote) Rechteck\n"
                           "• Button 'Überlappungen zusammenführen': Kombiniert sich überlappende Rechtecke\n"
+                          "• Button 'Raster vervollständigen': Ergänzt fehlende Stellplätze in Parkreihen\n"
                           "• Rechte Maustaste auf Rechteck: Rechteck sofort löschen\n"
                           "• Mausrad: Zoomen (oder +/- Buttons)\n"
-                          "• Auto-Erkennung: Automatisch Rechtecke erkennen")
+                          "• Strg+Z / Strg+Y: Rückgängig / Wiederholen\n"
+                          "• F12: Frame-Zeiten anzeigen\n"
+                          "• Auto-Erkennung: Automatisch Rechtecke erkennen\n"
+                          "• Bereich erkennen: Bereich aufziehen, nur darin erkennen und mit bestehenden Rechtecken zusammenführen")
         
         instruction_label = ttk.Label(main_frame, text=instruction_text, justify=tk.LEFT)
         instruction_label.pack(pady=(10, 0))
@@ -123,53 +731,108 @@ class RectangleEditor:
     
     def load_file(self, file_path):
         try:
+            # Stand der bisherigen Sitzung, falls dieselbe Datei erneut geöffnet wird
+            previous_rectangles = self.rectangles
+            
+            try:
+                budget = self.memory_budget_mb.get()
+            except tk.TclError:
+                budget = 0
+            
+            # Bei PDFs nur die erste Seite rendern (Demo)
+            # Die alte Seite bleibt erhalten, bis die neue erfolgreich geladen ist
+            try:
+                page_store = PageImageStore(file_path, memory_budget_mb=budget or None)
+            except Exception as e:
+                messagebox.showerror("Fehler", f"Konnte Datei nicht laden: {str(e)}")
+                return
+            self.page_store = page_store
+            self.current_image = page_store.working
+            
             if is_pdf_file(file_path):
-                # PDF verarbeiten - nur erste Seite für Demo
-                pil_images = convert_pdf_to_images(file_path)
-                if pil_images:
-                    self.current_image = pil_to_opencv(pil_images[0])
-                    self.info_label.config(text=f"PDF geladen: {os.path.basename(file_path)} (Seite 1)")
-                else:
-                    messagebox.showerror("Fehler", "Konnte PDF nicht laden")
-                    return
+                self.text_spans = extract_text_spans(file_path, 0)
+                loaded_text = f"PDF geladen: {os.path.basename(file_path)} (Seite 1)"
             else:
-                # Normales Bild laden
-                self.current_image = cv2.imread(file_path)
-                if self.current_image is None:
-                    messagebox.showerror("Fehler", "Konnte Bild nicht laden")
-                    return
-                self.info_label.config(text=f"Bild geladen: {os.path.basename(file_path)}")
+                self.text_spans = []
+                loaded_text = f"Bild geladen: {os.path.basename(file_path)}"
             
             self.rectangles = []
+            self.selected_rect = None
+            self.history.clear()
             self.zoom_factor = 1.0  # Reset zoom when loading new file
             self.display_image_on_canvas()
+            self.info_label.config(text=f"{loaded_text} - {self.page_store.memory_report()}")
+            self.start_session(file_path, previous_rectangles)
             
         except Exception as e:
             messagebox.showerror("Fehler", f"Fehler beim Laden der Datei: {str(e)}")
     
-    def display_image_on_canvas(self):
+    def start_session(self, file_path, previous_rectangles=()):
+        """
+        Startet das Auto-Speichern für die geladene Datei und bietet ggf. die Wiederherstellung an.
+        
+        :param file_path: Pfad der geladenen Datei
+        :param previous_rectangles: Rechtecke der bisherigen Sitzung vor dem Laden
+        """
+        # Das alte Journal verdichtet im Hintergrund weiter, der Tk-Thread wartet nicht darauf
+        predecessor = self.journal
+        self.journal = None
+        if predecessor is not None:
+            predecessor.close(wait=False)
+        
+        if predecessor is not None and predecessor.base_path == os.path.abspath(file_path):
+            # Dieselbe Datei: Die Dateien auf der Platte sind evtl. noch nicht fertig geschrieben,
+            # der Stand im Speicher entspricht aber genau dem, was das alte Journal sichert
+            restored = list(previous_rectangles)
+        else:
+            restored = SessionJournal.load(file_path)
+        if restored and messagebox.askyesno(
+                "Sitzung wiederherstellen",
+                f"Für diese Datei existiert eine automatisch gespeicherte Sitzung mit {len(restored)} Rechteck(en).\n"
+                f"Wiederherstellen?"):
+            self.rectangles = restored
+            self.draw_rectangles()
+        
+        self.journal = SessionJournal(file_path, self.rectangles, predecessor=predecessor)
+    
+    def on_close(self):
+        """Schließt das Fenster nachdem das Auto-Speichern abgeschlossen ist"""
+        self.frames.cancel()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        self.master.destroy()
+    
+    def display_image_on_canvas(self, preview=False):
+        """
+        Zeichnet Bild und Rechtecke neu.
+        
+        :param preview: Schnelles Rendering niedriger Qualität (während Zoom-Eingaben)
+        """
         if self.current_image is None:
             return
         
-        # Bild zu PIL konvertieren
-        image_rgb = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(image_rgb)
-        
-        # Skalierung berechnen um in Canvas zu passen
-        img_width, img_height = pil_image.size
+        # Skalierung berechnen um in Canvas zu passen (bezogen auf die volle Auflösung)
+        img_width, img_height = self.page_store.full_size
         self.scale_factor = min(self.canvas_width / img_width, self.canvas_height / img_height, 1.0)
         
         # Zoom anwenden
         final_scale = self.scale_factor * self.zoom_factor
         
-        new_width = int(img_width * final_scale)
-        new_height = int(img_height * final_scale)
-        
-        self.display_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        # Vorschau mit Nächster-Nachbar, sonst Verkleinern mit INTER_AREA und Vergrößern mit Lanczos
+        if preview:
+            interpolation = cv2.INTER_NEAREST
+        elif final_scale * self.page_store.level <= 1.0:
+            interpolation = cv2.INTER_AREA
+        else:
+            interpolation = cv2.INTER_LANCZOS4
+        self.display_image = self.page_store.render(final_scale, interpolation)
+        new_width, new_height = self.display_image.size
         self.photo = ImageTk.PhotoImage(self.display_image)
         
         # Canvas konfigurieren
         self.canvas.delete("all")
+        self.temp_item = None
         self.canvas.configure(scrollregion=(0, 0, new_width, new_height))
         self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
         
@@ -186,12 +849,59 @@ class RectangleEditor:
             return
         
         # Automatische Rechteckerkennung
-        detected_rects = process_image_for_rectangles(self.current_image.copy())
-        self.rectangles = detected_rects
+        detected_rects = self.page_store.detect(**self.detector_params)
+        self.replace_rectangles(detected_rects)
+        self.selected_rect = None
         self.draw_rectangles()
         
         messagebox.showinfo("Info", f"{len(detected_rects)} Rechteck(e) automatisch erkannt")
     
+    def start_region_detect(self):
+        """Aktiviert die Bereichsauswahl: das nächste gezogene Rechteck wird als Erkennungsbereich verwendet"""
+        if self.current_image is None:
+            messagebox.showwarning("Warnung", "Bitte laden Sie zuerst eine Datei")
+            return
+        self.region_mode = True
+        self.info_label.config(text="Ziehen Sie einen Bereich auf, in dem Rechtecke erkannt werden sollen")
+    
+    def detect_region(self, region):
+        """
+        Erkennt Rechtecke nur im angegebenen Bereich und fügt neue zu den bestehenden hinzu.
+        Bestehende Rechtecke (auch manuell bearbeitete) bleiben unverändert.
+        
+        :param region: Bereich (x_min, y_min, x_max, y_max) in Bildkoordinaten
+        """
+        detected_rects = self.page_store.detect(region, **self.detector_params)
+        
+        # Nur bestehende Rechtecke im Bereich zum Vergleich heranziehen
+        rx1, ry1, rx2, ry2 = region
+        nearby = [rect for rect in self.rectangles
+                  if rect[0] < rx2 and rect[2] > rx1 and rect[1] < ry2 and rect[3] > ry1]
+        new_rects = [rect for rect in detected_rects
+                     if not any(self.rectangles_overlap(rect, existing) for existing in nearby)]
+        
+        # Alle Ergänzungen als ein Undo-Schritt
+        start_index = len(self.rectangles)
+        self.execute_command(("group", tuple(("add", start_index + i, rect) for i, rect in enumerate(new_rects))))
+        self.draw_rectangles()
+        
+        self.info_label.config(text=f"Bereichserkennung: {len(detected_rects)} erkannt, {len(new_rects)} neu hinzugefügt")
+    
+    def load_profile(self):
+        """Lädt ein Parameterprofil (z.B. von tune.py erstellt) für die Auto-Erkennung"""
+        file_path = filedialog.askopenfilename(
+            title="Profil laden",
+            filetypes=[("JSON Dateien", "*.json"), ("Alle Dateien", "*.*")]
+        )
+        
+        if file_path:
+            try:
+                self.detector_params = load_detector_profile(file_path)
+                messagebox.showinfo("Erfolg", f"Profil geladen: {os.path.basename(file_path)}\n"
+                                            + "\n".join(f"{k} = {v}" for k, v in self.detector_params.items()))
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Fehler", f"Fehler beim Laden des Profils: {str(e)}")
+    
     def load_rectangles(self):
         """Lädt Rechtecke aus einer JSON-Datei"""
         file_path = filedialog.askopenfilename(
@@ -212,7 +922,7 @@ class RectangleEditor:
                             x1, y1, x2, y2 = rect
                             loaded_rectangles.append((int(x1), int(y1), int(x2), int(y2)))
                     
-                    self.rectangles = loaded_rectangles
+                    self.replace_rectangles(loaded_rectangles)
                     self.selected_rect = None
                     self.draw_rectangles()
                     
@@ -226,14 +936,48 @@ class RectangleEditor:
                 messagebox.showerror("Fehler", f"Fehler beim Laden: {str(e)}")
     
     def clear_all(self):
-        self.rectangles = []
+        self.replace_rectangles([])
         self.selected_rect = None
         self.draw_rectangles()
     
+    def execute_command(self, command):
+        """Führt einen Bearbeitungsbefehl aus und nimmt ihn in den Undo-Verlauf auf"""
+        apply_edit_command(self.rectangles, command)
+        self.history.push(command)
+        self.journal_command(command)
+    
+    def journal_command(self, command):
+        """Übergibt einen ausgeführten Befehl an das Auto-Speichern"""
+        if self.journal is not None:
+            self.journal.append(command)
+    
+    def replace_rectangles(self, new_rectangles):
+        """
+        Ersetzt die Rechteckliste und protokolliert nur die Unterschiede als einen Undo-Schritt.
+        Unveränderte Rechtecke behalten ihre Reihenfolge, neue werden angehängt.
+        """
+        self.execute_command(diff_edit_command(self.rectangles, [tuple(rect) for rect in new_rectangles]))
+    
+    def undo(self):
+        """Macht den letzten Bearbeitungsschritt rückgängig"""
+        command = self.history.undo(self.rectangles)
+        if command is not None:
+            self.journal_command(command)
+            self.selected_rect = None
+            self.draw_rectangles()
+    
+    def redo(self):
+        """Stellt den zuletzt rückgängig gemachten Bearbeitungsschritt wieder her"""
+        command = self.history.redo(self.rectangles)
+        if command is not None:
+            self.journal_command(command)
+            self.selected_rect = None
+            self.draw_rectangles()
+    
     def delete_selected(self):
         """Löscht das aktuell ausgewählte Rechteck"""
         if self.selected_rect is not None and 0 <= self.selected_rect < len(self.rectangles):
-            del self.rectangles[self.selected_rect]
+            self.execute_command(("remove", self.selected_rect, self.rectangles[self.selected_rect]))
             self.selected_rect = None
             self.draw_rectangles()
             messagebox.showinfo("Info", "Ausgewähltes Rechteck wurde gelöscht")
@@ -310,6 +1054,7 @@ class RectangleEditor:
             return
         
         original_count = len(self.rectangles)
+        rectangles = list(self.rectangles)
         merged = True
         
         while merged:
@@ -317,7 +1062,7 @@ class RectangleEditor:
             new_rectangles = []
             used_indices = set()
             
-            for i, rect1 in enumerate(self.rectangles):
+            for i, rect1 in enumerate(rectangles):
                 if i in used_indices:
                     continue
                 
@@ -325,7 +1070,7 @@ class RectangleEditor:
                 merged_with = [i]
                 
                 # Suche nach überlappenden Rechtecken
-                for j, rect2 in enumerate(self.rectangles):
+                for j, rect2 in enumerate(rectangles):
                     if j <= i or j in used_indices:
                         continue
                     
@@ -340,8 +1085,10 @@ class RectangleEditor:
                 
                 new_rectangles.append(current_rect)
             
-            self.rectangles = new_rectangles
+            rectangles = new_rectangles
         
+        # Alle Zusammenführungen als ein Undo-Schritt
+        self.replace_rectangles(rectangles)
         new_count = len(self.rectangles)
         merged_count = original_count - new_count
         
@@ -357,9 +1104,36 @@ class RectangleEditor:
         else:
             messagebox.showinfo("Info", "Keine überlappenden Rechtecke gefunden")
     
+    def complete_grid(self):
+        """Ergänzt fehlende Stellplätze in erkannten Parkreihen und verwirft Ausreißer im Raster"""
+        if not self.rectangles:
+            messagebox.showwarning("Warnung", "Keine Rechtecke vorhanden")
+            return
+        
+        original_count = len(self.rectangles)
+        rows, unassigned = fit_parking_rows(self.rectangles)
+        if not rows:
+            messagebox.showinfo("Info", "Keine Parkreihen gefunden")
+            return
+        
+        row_rectangles = rows_to_rectangles(rows)
+        
+        # Nicht zugeordnete Rechtecke nur behalten, wenn sie keinen Rasterplatz überdecken
+        kept = [rect for rect in unassigned
+                if not any(self.rectangles_overlap(rect, row_rect) for row_rect in row_rectangles)]
+        
+        self.replace_rectangles(row_rectangles + kept)
+        self.selected_rect = None
+        self.draw_rectangles()
+        
+        messagebox.showinfo("Erfolg", f"{len(rows)} Parkreihe(n) mit {len(row_rectangles)} Stellplätzen gefunden.\n"
+                                    f"Vorher: {original_count} Rechtecke\n"
+                                    f"Nachher: {len(self.rectangles)} Rechtecke")
+    
     def draw_rectangles(self):
         # Lösche alle Rechtecke auf Canvas
         self.canvas.delete("rectangle")
+        self.rect_item_ids = []
         
         for i, (x1, y1, x2, y2) in enumerate(self.rectangles):
             # Koordinaten skalieren (inklusive Zoom)
@@ -372,10 +1146,67 @@ class RectangleEditor:
             # Farbe je nach Auswahl
             color = "red" if i == self.selected_rect else "green"
             
-            self.canvas.create_rectangle(
+            self.rect_item_ids.append(self.canvas.create_rectangle(
                 scaled_x1, scaled_y1, scaled_x2, scaled_y2,
                 outline=color, width=2, tags="rectangle"
+            ))
+    
+    def render_frame(self, parts):
+        """
+        Zeichnet die seit dem letzten Frame angeforderten Teile (aufgerufen vom FrameScheduler).
+        
+        :param parts: Menge aus "image", "rectangles", "selected", "temp"
+        """
+        if "image" in parts:
+            # Schnelle Vorschau, das hochwertige Rendering folgt nach Ende der Eingaben
+            self.display_image_on_canvas(preview=True)
+        elif "rectangles" in parts:
+            self.draw_rectangles()
+        elif "selected" in parts:
+            self.update_selected_item()
+        
+        if "temp" in parts:
+            self.update_temp_item()
+    
+    def update_selected_item(self):
+        """Verschiebt nur das Canvas-Item des ausgewählten Rechtecks statt alle neu zu zeichnen"""
+        if self.selected_rect is None or len(self.rect_item_ids) != len(self.rectangles):
+            self.draw_rectangles()
+            return
+        final_scale = self.scale_factor * self.zoom_factor
+        x1, y1, x2, y2 = self.rectangles[self.selected_rect]
+        self.canvas.coords(self.rect_item_ids[self.selected_rect],
+                           x1 * final_scale, y1 * final_scale, x2 * final_scale, y2 * final_scale)
+    
+    def update_temp_item(self):
+        """Aktualisiert das gerade gezogene Rechteck; das Canvas-Item wird nur einmal erzeugt"""
+        if not (self.drawing and self.current_rect):
+            return
+        final_scale = self.scale_factor * self.zoom_factor
+        scaled = [v * final_scale for v in self.current_rect]
+        
+        if self.temp_item is not None:
+            self.canvas.coords(self.temp_item, *scaled)
+        # Erkennungsbereich gestrichelt in Orange, neues Rechteck in Blau
+        elif self.region_mode:
+            self.temp_item = self.canvas.create_rectangle(
+                *scaled, outline="orange", width=2, dash=(4, 2), tags="temp_rectangle"
             )
+        else:
+            self.temp_item = self.canvas.create_rectangle(
+                *scaled, outline="blue", width=2, tags="temp_rectangle"
+            )
+    
+    def show_frame_stats(self):
+        """Zeigt die gemessenen Frame-Zeiten in der Info-Zeile und auf der Konsole an"""
+        stats = self.frames.stats()
+        frames, settle = stats["frames"], stats["settle"]
+        text = (f"Frames: {frames['count']}, Mittel {frames['mean_ms']:.1f} ms, "
+                f"95% {frames['p95_ms']:.1f} ms, Max {frames['max_ms']:.1f} ms | "
+                f"Hochwertig: {settle['count']}, Mittel {settle['mean_ms']:.1f} ms | "
+                f"Zusammengefasst: {stats['coalesced']} Ereignisse")
+        self.info_label.config(text=text)
+        print(text)
     
     def get_canvas_coordinates(self, event):
         # Canvas Scroll-Position berücksichtigen
@@ -407,12 +1238,13 @@ class RectangleEditor:
         # Prüfen ob auf existierendes Rechteck geklickt wurde
         rect_index = self.find_rectangle_at_position(image_x, image_y)
         
-        if rect_index is not None:
+        if rect_index is not None and not self.region_mode:
             # Rechteck auswählen für Verschieben
             self.selected_rect = rect_index
             self.drawing = False
             self.drag_data["x"] = image_x
             self.drag_data["y"] = image_y
+            self.drag_start = self.rectangles[rect_index]
             print(f"Rechteck {rect_index + 1} ausgewählt")  # Debug-Info
         else:
             # Neues Rechteck beginnen
@@ -432,22 +1264,10 @@ class RectangleEditor:
         image_x, image_y = self.canvas_to_image_coordinates(canvas_x, canvas_y)
         
         if self.drawing and self.current_rect:
-            # Neues Rechteck zeichnen
+            # Neues Rechteck zeichnen, angezeigt wird im nächsten Frame
             self.current_rect[2] = image_x
             self.current_rect[3] = image_y
-            
-            # Temporäres Rechteck anzeigen
-            self.draw_rectangles()
-            final_scale = self.scale_factor * self.zoom_factor
-            scaled_x1 = self.current_rect[0] * final_scale
-            scaled_y1 = self.current_rect[1] * final_scale
-            scaled_x2 = self.current_rect[2] * final_scale
-            scaled_y2 = self.current_rect[3] * final_scale
-            
-            self.canvas.create_rectangle(
-                scaled_x1, scaled_y1, scaled_x2, scaled_y2,
-                outline="blue", width=2, tags="temp_rectangle"
-            )
+            self.frames.request("temp")
         
         elif self.selected_rect is not None:
             # Rechteck verschieben
@@ -459,10 +1279,21 @@ class RectangleEditor:
             
             self.drag_data["x"] = image_x
             self.drag_data["y"] = image_y
-            self.draw_rectangles()
+            self.frames.request("selected")
     
     def on_release(self, event):
         self.canvas.delete("temp_rectangle")
+        self.temp_item = None
+        
+        # Gesamte Verschiebung als ein einziger Undo-Schritt
+        if self.drag_start is not None and self.selected_rect is not None:
+            dx = self.rectangles[self.selected_rect][0] - self.drag_start[0]
+            dy = self.rectangles[self.selected_rect][1] - self.drag_start[1]
+            if dx or dy:
+                command = ("move", self.selected_rect, dx, dy)
+                self.history.push(command)
+                self.journal_command(command)
+        self.drag_start = None
         
         if self.drawing and self.current_rect:
             # Neues Rechteck hinzufügen
@@ -472,9 +1303,14 @@ class RectangleEditor:
             min_x, max_x = min(x1, x2), max(x1, x2)
             min_y, max_y = min(y1, y2), max(y1, y2)
             
+            if self.region_mode:
+                # Gezogenes Rechteck ist der Erkennungsbereich
+                self.region_mode = False
+                if abs(max_x - min_x) > 5 and abs(max_y - min_y) > 5:
+                    self.detect_region((min_x, min_y, max_x, max_y))
             # Nur hinzufügen wenn Rechteck groß genug
-            if abs(max_x - min_x) > 5 and abs(max_y - min_y) > 5:
-                self.rectangles.append((min_x, min_y, max_x, max_y))
+            elif abs(max_x - min_x) > 5 and abs(max_y - min_y) > 5:
+                self.execute_command(("add", len(self.rectangles), (min_x, min_y, max_x, max_y)))
                 self.draw_rectangles()
         
         self.drawing = False
@@ -490,7 +1326,7 @@ class RectangleEditor:
         # Rechteck an Position finden und löschen
         rect_index = self.find_rectangle_at_position(image_x, image_y)
         if rect_index is not None:
-            del self.rectangles[rect_index]
+            self.execute_command(("remove", rect_index, self.rectangles[rect_index]))
             if self.selected_rect == rect_index:
                 self.selected_rect = None
             elif self.selected_rect is not None and self.selected_rect > rect_index:
@@ -509,32 +1345,29 @@ class RectangleEditor:
         else:  # Herauszoomen
             self.zoom_factor = max(self.zoom_factor - zoom_delta, 0.1)  # Min 0.1x zoom
         
-        self.display_image_on_canvas()
-        self.draw_rectangles()
+        # Schnelle Ereignisse zu einem Frame zusammenfassen, hochwertig erst wenn das Rad stillsteht
+        self.frames.request("image", settle=True)
     
     def zoom_in(self):
         """Hineinzoomen"""
         if self.current_image is None:
             return
         self.zoom_factor = min(self.zoom_factor + 0.2, 5.0)
-        self.display_image_on_canvas()
-        self.draw_rectangles()
+        self.frames.request("image", settle=True)
     
     def zoom_out(self):
         """Herauszoomen"""
         if self.current_image is None:
             return
         self.zoom_factor = max(self.zoom_factor - 0.2, 0.1)
-        self.display_image_on_canvas()
-        self.draw_rectangles()
+        self.frames.request("image", settle=True)
     
     def zoom_reset(self):
         """Zoom zurücksetzen"""
         if self.current_image is None:
             return
         self.zoom_factor = 1.0
-        self.display_image_on_canvas()
-        self.draw_rectangles()
+        self.frames.request("image", settle=True)
     
     def save_rectangles(self):
         if not self.rectangles:
@@ -565,11 +1398,20 @@ class RectangleEditor:
                         print(f"Warning: Skipping invalid rectangle {i}: {rect} - {e}")
                         continue
                 
+                # Kompakte Reihendarstellung zusätzlich zu den Einzelrechtecken. Ohne Auffüllen von
+                # Lücken, damit bewusst gelöschte Stellplätze (z.B. an Stützen) nicht zurückkehren
+                rows, _ = fit_parking_rows(serializable_rectangles, max_missing=0)
+                
+                # Stellplatznummern aus dem PDF-Text (null wenn kein Text im Rechteck)
+                labels = assign_labels(serializable_rectangles, self.text_spans)
+                
                 data = {
                     "rectangles": serializable_rectangles,
+                    "labels": labels,
+                    "rows": rows,
                     "image_size": {
-                        "width": int(self.current_image.shape[1]) if self.current_image is not None else 0,
-                        "height": int(self.current_image.shape[0]) if self.current_image is not None else 0
+                        "width": int(self.page_store.full_size[0]) if self.page_store is not None else 0,
+                        "height": int(self.page_store.full_size[1]) if self.page_store is not None else 0
                     },
                     "total_count": len(serializable_rectangles),
                     "zoom_factor": float(self.zoom_factor),
@@ -582,8 +1424,9 @@ class RectangleEditor:
                 else:
                     with open(file_path, 'w', encoding='utf-8') as f:
                         f.write("Erkannte Rechtecke:\n")
-                        for i, (x1, y1, x2, y2) in enumerate(serializable_rectangles, 1):
-                            f.write(f"Rechteck {i}: x_min={x1}, y_min={y1}, x_max={x2}, y_max={y2}\n")
+                        for i, ((x1, y1, x2, y2), label) in enumerate(zip(serializable_rectangles, labels), 1):
+                            label_text = f", label={label}" if label else ""
+                            f.write(f"Rechteck {i}: x_min={x1}, y_min={y1}, x_max={x2}, y_max={y2}{label_text}\n")
                         f.write(f"\nGesamtanzahl: {len(serializable_rectangles)} Rechtecke\n")
                 
                 messagebox.showinfo("Erfolg", f"Rechtecke gespeichert in: {file_path}")
@@ -609,17 +1452,48 @@ class RectangleEditor:
         
         if file_path:
             try:
-                # Kopie des Bildes erstellen
-                annotated_image = self.current_image.copy()
-                
-                # Rechtecke einzeichnen
-                for x1, y1, x2, y2 in self.rectangles:
-                    cv2.rectangle(annotated_image, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+                # Volle Auflösung nur für den Export erzeugen
+                annotated_image = self.page_store.materialize_full()
                 
-                cv2.imwrite(file_path, annotated_image)
-                messagebox.showinfo("Erfolg", f"Annotiertes Bild gespeichert: {file_path}")
+                # Alle Rechtecke in einem Aufruf als geschlossene Polygone einzeichnen
+                if self.rectangles:
+                    rects = np.array(self.rectangles, dtype=np.float64).astype(np.int32).reshape(-1, 4)
+                    x1, y1, x2, y2 = rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3]
+                    corners = np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                                        np.stack([x2, y2], 1), np.stack([x1, y2], 1)], axis=1)
+                    cv2.polylines(annotated_image, list(corners), True, (0, 255, 0), 2)
             except Exception as e:
                 messagebox.showerror("Fehler", f"Fehler beim Speichern: {str(e)}")
+                return
+            
+            # Kodieren und Schreiben im Hintergrund, damit die Oberfläche bedienbar bleibt
+            result = {}
+            
+            def write_image():
+                try:
+                    result["ok"] = cv2.imwrite(file_path, annotated_image)
+                except Exception as e:
+                    result["error"] = e
+            
+            writer = threading.Thread(target=write_image, name="AnnotatedImageWriter", daemon=True)
+            writer.start()
+            self.info_label.config(text=f"Speichere {os.path.basename(file_path)}...")
+            self.master.after(100, self._check_image_written, writer, result, file_path)
+    
+    def _check_image_written(self, writer, result, file_path):
+        """Fragt ab, ob das Schreiben des annotierten Bildes abgeschlossen ist (Tk darf nur im Hauptthread benutzt werden)"""
+        if writer.is_alive():
+            self.master.after(100, self._check_image_written, writer, result, file_path)
+            return
+        
+        if self.page_store is not None:
+            self.info_label.config(text=self.page_store.memory_report())
+        if "error" in result:
+            messagebox.showerror("Fehler", f"Fehler beim Speichern: {str(result['error'])}")
+        elif not result.get("ok"):
+            messagebox.showerror("Fehler", f"Bild konnte nicht geschrieben werden: {file_path}")
+        else:
+            messagebox.showinfo("Erfolg", f"Annotiertes Bild gespeichert: {file_path}")
 
 
 def is_pdf_file(file_path):
@@ -665,6 +1539,69 @@ def convert_pdf_to_images(pdf_path, dpi=200):
         print(f"Fehler beim Konvertieren der PDF-Datei: {e}")
         return []
 
+def convert_pdf_page_to_image(pdf_path, page_num, dpi=200):
+    """
+    Rendert eine einzelne PDF-Seite als PIL-Bild, ohne die übrigen Seiten zu konvertieren.
+    
+    :param pdf_path: Pfad zur PDF-Datei
+    :param page_num: Seitennummer (0-basiert)
+    :param dpi: Auflösung für die Konvertierung
+    :return: PIL-Bild
+    """
+    zoom = dpi / 72.0
+    with fitz.open(pdf_path) as doc:
+        pix = doc[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        return Image.open(io.BytesIO(pix.tobytes("ppm")))
+
+def extract_text_spans(pdf_path, page_num=0, dpi=200):
+    """
+    Liest Textstellen mit Position direkt aus einer PDF-Seite (kein OCR nötig bei Vektor-PDFs).
+    
+    :param pdf_path: Pfad zur PDF-Datei
+    :param page_num: Seitennummer (0-basiert)
+    :param dpi: Auflösung der gerenderten Seite, auf die die Koordinaten umgerechnet werden
+    :return: Liste von (Text, (x_min, y_min, x_max, y_max)) in Pixelkoordinaten
+    """
+    zoom = dpi / 72.0
+    spans = []
+    try:
+        with fitz.open(pdf_path) as doc:
+            page = doc[page_num]
+            # Textkoordinaten beziehen sich auf die ungedrehte Seite, gerendert wird gedreht
+            matrix = page.rotation_matrix * fitz.Matrix(zoom, zoom)
+            for block in page.get_text("dict")["blocks"]:
+                for line in block.get("lines", []):
+                    for span in line["spans"]:
+                        text = span["text"].strip()
+                        if text:
+                            rect = fitz.Rect(span["bbox"]) * matrix
+                            spans.append((text, (rect.x0, rect.y0, rect.x1, rect.y1)))
+    except Exception as e:
+        print(f"Fehler beim Lesen des PDF-Texts: {e}")
+    return spans
+
+def assign_labels(rectangles, spans):
+    """
+    Ordnet Textstellen den Rechtecken zu, die ihren Mittelpunkt enthalten (räumlicher Join).
+    Liegt ein Mittelpunkt in mehreren Rechtecken, gewinnt das kleinste.
+    
+    :param rectangles: Liste von Rechtecken (x1, y1, x2, y2)
+    :param spans: Liste von (Text, (x_min, y_min, x_max, y_max)) wie von extract_text_spans
+    :return: Liste mit einem Label pro Rechteck (mehrere Texte mit Leerzeichen verbunden) oder None
+    """
+    normalized = [(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)) for x1, y1, x2, y2 in rectangles]
+    index = SpatialIndex(normalized)
+    texts = [[] for _ in normalized]
+    
+    # In Lesereihenfolge zuordnen, damit mehrteilige Labels richtig zusammengesetzt werden
+    for text, (x1, y1, x2, y2) in sorted(spans, key=lambda span: (span[1][1], span[1][0])):
+        candidates = index.query_point((x1 + x2) / 2, (y1 + y2) / 2)
+        if candidates:
+            best = min(candidates, key=lambda i: (normalized[i][2] - normalized[i][0]) * (normalized[i][3] - normalized[i][1]))
+            texts[best].append(text)
+    
+    return [" ".join(parts) if parts else None for parts in texts]
+
 def pil_to_opencv(pil_image):
     """
     Konvertiert ein PIL-Bild zu einem OpenCV-Bild.
@@ -678,16 +1615,21 @@ def pil_to_opencv(pil_image):
     open_cv_image = open_cv_image[:, :, ::-1].copy()
     return open_cv_image
 
-def detect_rectangles(file_path, min_area=1000, epsilon_coef=0.02):
+def detect_rectangles(file_path, min_area=1000, epsilon_coef=0.02, blur_kernel=5, canny_low=50, canny_high=150):
     """
     Erkennt Rechtecke in einem Bild oder PDF und gibt deren Bounding-Box-Koordinaten aus.
     
     :param file_path: Pfad zum Eingangsbild oder PDF
     :param min_area: Minimale Fläche eines Konturs, damit es als Rechteck gilt
     :param epsilon_coef: Koeffizient für die Polygon-Approximation
-    :return: Liste von Rechtecken als (x_min, y_min, x_max, y_max) pro Seite/Bild
+    :param blur_kernel: Kantenlänge des Gauß-Filters (ungerade)
+    :param canny_low: Untere Schwelle des Canny-Kantendetektors
+    :param canny_high: Obere Schwelle des Canny-Kantendetektors
+    :return: (Liste von Rechtecken als (x_min, y_min, x_max, y_max) pro Seite/Bild,
+              Liste der Labels pro Seite/Bild mit einem Label oder None pro Rechteck)
     """
     all_rectangles = []
+    all_labels = []
     
     # Überprüfen, ob es sich um eine PDF-Datei handelt
     if is_pdf_file(file_path):
@@ -696,7 +1638,7 @@ def detect_rectangles(file_path, min_area=1000, epsilon_coef=0.02):
         
         if not pil_images:
             print("Fehler: Konnte PDF nicht in Bilder konvertieren.")
-            return all_rectangles
+            return all_rectangles, all_labels
             
         print(f"PDF hat {len(pil_images)} Seite(n).")
         
@@ -704,14 +1646,19 @@ def detect_rectangles(file_path, min_area=1000, epsilon_coef=0.02):
         for page_num, pil_image in enumerate(pil_images, start=1):
             print(f"\nVerarbeite Seite {page_num}...")
             img = pil_to_opencv(pil_image)
-            rectangles = process_image_for_rectangles(img, min_area, epsilon_coef)
+            rectangles = process_image_for_rectangles(img, min_area, epsilon_coef, blur_kernel, canny_low, canny_high)
+            
+            # Stellplatznummern direkt aus dem PDF-Text statt per OCR
+            labels = assign_labels(rectangles, extract_text_spans(file_path, page_num - 1))
             
             # Rechtecke für diese Seite ausgeben
             print(f"Seite {page_num}: {len(rectangles)} Rechteck(e) gefunden")
-            for idx, (x1, y1, x2, y2) in enumerate(rectangles, start=1):
-                print(f"  Rechteck {idx}: x_min={x1}, y_min={y1}, x_max={x2}, y_max={y2}")
+            for idx, ((x1, y1, x2, y2), label) in enumerate(zip(rectangles, labels), start=1):
+                label_text = f", label={label}" if label else ""
+                print(f"  Rechteck {idx}: x_min={x1}, y_min={y1}, x_max={x2}, y_max={y2}{label_text}")
             
             all_rectangles.append(rectangles)
+            all_labels.append(labels)
             
             # Visualisierung für jede Seite speichern
             cv2.imwrite(f"detected_rectangles_page_{page_num}.png", img)
@@ -722,36 +1669,151 @@ def detect_rectangles(file_path, min_area=1000, epsilon_coef=0.02):
         img = cv2.imread(file_path)
         if img is None:
             print(f"Fehler: Konnte Bild nicht laden: {file_path}")
-            return all_rectangles
+            return all_rectangles, all_labels
             
-        rectangles = process_image_for_rectangles(img, min_area, epsilon_coef)
+        rectangles = process_image_for_rectangles(img, min_area, epsilon_coef, blur_kernel, canny_low, canny_high)
         
         # Rechtecke ausgeben
         for idx, (x1, y1, x2, y2) in enumerate(rectangles, start=1):
             print(f"Rechteck {idx}: x_min={x1}, y_min={y1}, x_max={x2}, y_max={y2}")
         
         all_rectangles.append(rectangles)
+        all_labels.append([None] * len(rectangles))
         
         # Visualisierung speichern
         cv2.imwrite("detected_rectangles.png", img)
     
-    return all_rectangles
+    return all_rectangles, all_labels
+
+DETECTOR_PARAM_NAMES = ("min_area", "epsilon_coef", "blur_kernel", "canny_low", "canny_high")
+
+def load_detector_profile(profile_path):
+    """
+    Lädt ein Parameterprofil für die Rechteckerkennung.
+    
+    :param profile_path: Pfad zur Profil-JSON-Datei (Feld "params")
+    :return: Dict mit Parametern für process_image_for_rectangles
+    """
+    with open(profile_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    if "params" not in data:
+        raise ValueError("Ungültiges Profil: 'params' Feld nicht gefunden")
+    
+    unknown = set(data["params"]) - set(DETECTOR_PARAM_NAMES)
+    if unknown:
+        raise ValueError(f"Unbekannte Parameter im Profil: {', '.join(sorted(unknown))}")
+    return dict(data["params"])
 
-def process_image_for_rectangles(img, min_area=1000, epsilon_coef=0.02):
+def process_image_for_rectangles(img, min_area=1000, epsilon_coef=0.02, blur_kernel=5, canny_low=50, canny_high=150, draw=True):
     """
     Verarbeitet ein OpenCV-Bild und erkennt Rechtecke darin.
     
     :param img: OpenCV-Bild (BGR-Format)
     :param min_area: Minimale Fläche eines Konturs
     :param epsilon_coef: Koeffizient für die Polygon-Approximation
+    :param blur_kernel: Kantenlänge des Gauß-Filters (ungerade)
+    :param canny_low: Untere Schwelle des Canny-Kantendetektors
+    :param canny_high: Obere Schwelle des Canny-Kantendetektors
+    :param draw: Erkannte Rechtecke ins Bild einzeichnen (False erlaubt schreibgeschützte Bilder ohne Kopie)
     :return: Liste von Rechtecken als (x_min, y_min, x_max, y_max)
     """
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-    edges = cv2.Canny(blurred, 50, 150)
+    blurred = blur_image(gray, blur_kernel)
+    edges = detect_edges(blurred, canny_low, canny_high)
+    contours = find_contours(edges)
+    rectangles, approxes = rectangles_from_contours(contours, min_area, epsilon_coef)
+    
+    # Rechtecke im Bild markieren
+    if draw:
+        cv2.drawContours(img, approxes, -1, (0, 255, 0), 2)
+    
+    return rectangles
+
+def detect_rectangles_in_region(img, region, border_margin=2, origin=(0, 0), image_size=None, **detector_params):
+    """
+    Erkennt Rechtecke nur in einem Ausschnitt des Bildes.
+    
+    Der Ausschnitt wird als View auf das Bild verarbeitet, die Ergebnisse in Bildkoordinaten
+    zurückgerechnet. Rechtecke, die den Rand des Ausschnitts berühren, sind vermutlich
+    abgeschnitten und werden verworfen (außer am Bildrand).
+    
+    :param img: OpenCV-Bild (BGR-Format), wird nicht verändert (darf schreibgeschützt sein)
+    :param region: Bereich (x_min, y_min, x_max, y_max) in Bildkoordinaten
+    :param border_margin: Abstand zum Ausschnittsrand in Pixeln, ab dem Rechtecke als abgeschnitten gelten
+    :param origin: Position der linken oberen Ecke von img im Gesamtbild, falls img selbst nur
+                   ein gerenderter Teil der Seite ist
+    :param image_size: (Breite, Höhe) des Gesamtbildes (Standard: Größe von img)
+    :param detector_params: Weitere Parameter für process_image_for_rectangles
+    :return: Liste von Rechtecken als (x_min, y_min, x_max, y_max) in Bildkoordinaten
+    """
+    ox, oy = origin
+    height, width = img.shape[:2]
+    full_width, full_height = image_size or (width, height)
+    x1, y1, x2, y2 = region
+    x1, x2 = max(0, ox, int(min(x1, x2))), min(full_width, ox + width, int(max(x1, x2)))
+    y1, y2 = max(0, oy, int(min(y1, y2))), min(full_height, oy + height, int(max(y1, y2)))
+    if x2 <= x1 or y2 <= y1:
+        return []
+    
+    # Ausschnitt als View ohne Kopie
+    crop = img[y1 - oy:y2 - oy, x1 - ox:x2 - ox]
+    detected = process_image_for_rectangles(crop, draw=False, **detector_params)
+    
+    crop_w, crop_h = x2 - x1, y2 - y1
+    rectangles = []
+    for cx1, cy1, cx2, cy2 in detected:
+        touches_border = ((cx1 <= border_margin and x1 > 0) or
+                          (cy1 <= border_margin and y1 > 0) or
+                          (cx2 >= crop_w - 1 - border_margin and x2 < full_width) or
+                          (cy2 >= crop_h - 1 - border_margin and y2 < full_height))
+        if touches_border:
+            continue
+        rectangles.append((int(cx1) + x1, int(cy1) + y1, int(cx2) + x1, int(cy2) + y1))
+    return rectangles
+
+def blur_image(gray, blur_kernel=5):
+    """
+    Erste Stufe der Erkennung: Glättung des Graustufenbildes.
+    
+    :param gray: Graustufenbild
+    :param blur_kernel: Kantenlänge des Gauß-Filters (ungerade)
+    :return: Geglättetes Bild
+    """
+    return cv2.GaussianBlur(gray, (blur_kernel, blur_kernel), 0)
+
+def detect_edges(blurred, canny_low=50, canny_high=150):
+    """
+    Zweite Stufe der Erkennung: Kantendetektion.
+    
+    :param blurred: Geglättetes Graustufenbild
+    :param canny_low: Untere Schwelle des Canny-Kantendetektors
+    :param canny_high: Obere Schwelle des Canny-Kantendetektors
+    :return: Kantenbild
+    """
+    return cv2.Canny(blurred, canny_low, canny_high)
+
+def find_contours(edges):
+    """
+    Dritte Stufe der Erkennung: Konturen im Kantenbild finden.
     
+    :param edges: Kantenbild
+    :return: Liste von Konturen
+    """
     contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    return contours
+
+def rectangles_from_contours(contours, min_area=1000, epsilon_coef=0.02):
+    """
+    Letzte Stufe der Erkennung: Konturen filtern und zu Rechtecken approximieren.
+    
+    :param contours: Liste von Konturen
+    :param min_area: Minimale Fläche eines Konturs
+    :param epsilon_coef: Koeffizient für die Polygon-Approximation
+    :return: (Liste von Rechtecken als (x_min, y_min, x_max, y_max), Liste der approximierten Polygone)
+    """
     rectangles = []
+    approxes = []
     
     for cnt in contours:
         area = cv2.contourArea(cnt)
@@ -769,12 +1831,225 @@ def process_image_for_rectangles(img, min_area=1000, epsilon_coef=0.02):
             x_min, x_max = min(xs), max(xs)
             y_min, y_max = min(ys), max(ys)
             rectangles.append((x_min, y_min, x_max, y_max))
-            
-            # Rechtecke im Bild markieren
-            cv2.drawContours(img, [approx], -1, (0, 255, 0), 2)
+            approxes.append(approx)
     
+    return rectangles, approxes
+
+def _median(values):
+    """
+    Median einer nicht-leeren Zahlenliste (ohne numpy, damit auch für Listen von Tupeln nutzbar).
+
+    :param values: Liste von Zahlen
+    :return: Median
+    """
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2.0
+
+def _fit_rows_along_x(rectangles, align_tol, size_tol, max_missing, min_count):
+    """
+    Sucht Reihen gleich großer Rechtecke, die entlang der x-Achse aufgereiht sind.
+
+    :param rectangles: Liste normalisierter Rechtecke (x_min, y_min, x_max, y_max)
+    :param align_tol: Maximale Abweichung der Ober-/Unterkanten in Pixeln
+    :param size_tol: Relative Toleranz für Breite und Höhe gegenüber dem Reihenmedian
+    :param max_missing: Maximale Anzahl fehlender Stellplätze, die innerhalb einer Reihe aufgefüllt wird
+    :param min_count: Minimale Anzahl tatsächlich erkannter Rechtecke pro Reihe
+    :return: (Liste von Reihen, Menge der Indizes, die einer Reihe zugeordnet wurden)
+    """
+    # Rechtecke mit gleicher Ober- und Unterkante gruppieren
+    groups = []
+    for idx in sorted(range(len(rectangles)), key=lambda i: rectangles[i][1]):
+        x1, y1, x2, y2 = rectangles[idx]
+        for group in groups:
+            if abs(group["y1"] - y1) <= align_tol and abs(group["y2"] - y2) <= align_tol:
+                group["members"].append(idx)
+                break
+        else:
+            groups.append({"y1": y1, "y2": y2, "members": [idx]})
+
+    rows = []
+    assigned = set()
+
+    for group in groups:
+        members = group["members"]
+        if len(members) < min_count:
+            continue
+
+        width = _median([rectangles[i][2] - rectangles[i][0] for i in members])
+        height = _median([rectangles[i][3] - rectangles[i][1] for i in members])
+        if width <= 0 or height <= 0:
+            continue
+
+        # Ausreißer in der Größe verwerfen
+        members = [i for i in members
+                   if abs((rectangles[i][2] - rectangles[i][0]) - width) <= size_tol * width
+                   and abs((rectangles[i][3] - rectangles[i][1]) - height) <= size_tol * height]
+        if len(members) < min_count:
+            continue
+        members.sort(key=lambda i: rectangles[i][0])
+
+        # Raster-Abstand (Pitch) aus benachbarten Rechtecken schätzen
+        deltas = [rectangles[b][0] - rectangles[a][0] for a, b in zip(members, members[1:])]
+        deltas = [d for d in deltas if 0.8 * width <= d <= 1.6 * width]
+        if not deltas:
+            continue
+        pitch = _median(deltas)
+        origin = rectangles[members[0]][0]
+        residual_tol = max(align_tol, 0.25 * pitch)
+
+        # Jedem Rechteck seinen Rasterplatz zuordnen, pro Platz nur das bestpassende behalten
+        slots = {}
+        for i in members:
+            k = int(round((rectangles[i][0] - origin) / pitch))
+            residual = abs(rectangles[i][0] - origin - k * pitch)
+            if residual > residual_tol:
+                continue
+            if k not in slots or residual < slots[k][1]:
+                slots[k] = (i, residual)
+        if len(slots) < min_count:
+            continue
+
+        # Ursprung und Pitch per Kleinste-Quadrate-Anpassung verfeinern
+        ks = sorted(slots)
+        if ks[-1] > ks[0]:
+            n = len(ks)
+            mean_k = sum(ks) / n
+            mean_x = sum(rectangles[slots[k][0]][0] for k in ks) / n
+            var_k = sum((k - mean_k) ** 2 for k in ks)
+            pitch = sum((k - mean_k) * (rectangles[slots[k][0]][0] - mean_x) for k in ks) / var_k
+            origin = mean_x - pitch * mean_k
+
+        # Bei zu großen Lücken die Reihe in Segmente aufteilen
+        segments = [[ks[0]]]
+        for k in ks[1:]:
+            if k - segments[-1][-1] - 1 > max_missing:
+                segments.append([k])
+            else:
+                segments[-1].append(k)
+
+        y_min = _median([rectangles[slots[k][0]][1] for k in ks])
+        for segment in segments:
+            if len(segment) < min_count:
+                continue
+            rows.append({
+                "origin": [round(float(origin + segment[0] * pitch), 1), round(float(y_min), 1)],
+                "pitch": [round(float(pitch), 2), 0.0],
+                "count": segment[-1] - segment[0] + 1,
+                "size": [round(float(width), 1), round(float(height), 1)]
+            })
+            assigned.update(slots[k][0] for k in segment)
+
+    return rows, assigned
+
+def fit_parking_rows(rectangles, align_tol=6, size_tol=0.2, max_missing=2, min_count=3):
+    """
+    Gruppiert erkannte Rechtecke zu Parkreihen mit gleichmäßigem Raster.
+
+    Stellplätze in Parkhausplänen liegen in Reihen nahezu identischer Rechtecke mit festem
+    Abstand. Eine Reihe wird kompakt als Ursprung, Pitch, Anzahl und Größe beschrieben.
+    Fehlende Stellplätze innerhalb einer Reihe werden dabei aufgefüllt, Rechtecke die nicht
+    ins Raster passen bleiben außen vor.
+
+    :param rectangles: Liste von Rechtecken (x1, y1, x2, y2)
+    :param align_tol: Maximale Abweichung ausgerichteter Kanten in Pixeln
+    :param size_tol: Relative Toleranz für die Stellplatzgröße
+    :param max_missing: Maximale Anzahl aufeinanderfolgender fehlender Stellplätze pro Reihe
+    :param min_count: Minimale Anzahl erkannter Rechtecke pro Reihe
+    :return: (Liste von Reihen als Dict mit "origin", "pitch", "count", "size",
+              Liste der Rechtecke die keiner Reihe zugeordnet wurden)
+    """
+    normalized = [(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+                  for x1, y1, x2, y2 in rectangles]
+
+    # Zuerst horizontale Reihen suchen
+    rows, assigned = _fit_rows_along_x(normalized, align_tol, size_tol, max_missing, min_count)
+
+    # Übrige Rechtecke auf vertikale Reihen prüfen (Koordinaten transponiert)
+    remaining = [i for i in range(len(normalized)) if i not in assigned]
+    transposed = [(normalized[i][1], normalized[i][0], normalized[i][3], normalized[i][2]) for i in remaining]
+    vertical_rows, vertical_assigned = _fit_rows_along_x(transposed, align_tol, size_tol, max_missing, min_count)
+    for row in vertical_rows:
+        rows.append({
+            "origin": row["origin"][::-1],
+            "pitch": row["pitch"][::-1],
+            "count": row["count"],
+            "size": row["size"][::-1]
+        })
+    assigned.update(remaining[i] for i in vertical_assigned)
+
+    unassigned = [rectangles[i] for i in range(len(rectangles)) if i not in assigned]
+    return rows, unassigned
+
+def rows_to_rectangles(rows):
+    """
+    Expandiert kompakte Parkreihen wieder zu einzelnen Rechtecken.
+
+    :param rows: Liste von Reihen wie von fit_parking_rows geliefert
+    :return: Liste von Rechtecken als (x_min, y_min, x_max, y_max)
+    """
+    rectangles = []
+    for row in rows:
+        ox, oy = row["origin"]
+        px, py = row["pitch"]
+        w, h = row["size"]
+        for k in range(row["count"]):
+            x1 = ox + k * px
+            y1 = oy + k * py
+            rectangles.append((int(round(x1)), int(round(y1)), int(round(x1 + w)), int(round(y1 + h))))
     return rectangles
 
+class SpatialIndex:
+    """
+    Gitterbasierter räumlicher Index für Rechtecke.
+
+    Jedes Rechteck wird in alle Gitterzellen eingetragen, die es überdeckt. Abfragen prüfen
+    nur Rechtecke aus den betroffenen Zellen statt der gesamten Liste.
+    """
+
+    def __init__(self, rectangles, cell_size=100):
+        """
+        :param rectangles: Liste von Rechtecken (x_min, y_min, x_max, y_max)
+        :param cell_size: Kantenlänge einer Gitterzelle in Pixeln (etwa Größe eines Stellplatzes)
+        """
+        self.rectangles = list(rectangles)
+        self.cell_size = cell_size
+        self.cells = {}
+        for index, rect in enumerate(self.rectangles):
+            for cell in self._cells_for(rect):
+                self.cells.setdefault(cell, []).append(index)
+
+    def _cells_for(self, rect):
+        x1, y1, x2, y2 = rect
+        size = self.cell_size
+        for cx in range(int(min(x1, x2) // size), int(max(x1, x2) // size) + 1):
+            for cy in range(int(min(y1, y2) // size), int(max(y1, y2) // size) + 1):
+                yield cx, cy
+
+    def query(self, rect):
+        """
+        :param rect: Suchbereich (x_min, y_min, x_max, y_max)
+        :return: Sortierte Indizes aller Rechtecke, die den Suchbereich schneiden oder berühren
+        """
+        x1, y1, x2, y2 = rect
+        found = set()
+        for cell in self._cells_for(rect):
+            for index in self.cells.get(cell, ()):
+                if index in found:
+                    continue
+                rx1, ry1, rx2, ry2 = self.rectangles[index]
+                if rx1 <= x2 and rx2 >= x1 and ry1 <= y2 and ry2 >= y1:
+                    found.add(index)
+        return sorted(found)
+
+    def query_point(self, x, y):
+        """
+        :return: Sortierte Indizes aller Rechtecke, die den Punkt (x, y) enthalten
+        """
+        return self.query((x, y, x, y))
+
 if __name__ == "__main__":
     # GUI-Modus wenn keine Kommandozeilenargumente
     if len(sys.argv) == 1:
@@ -784,7 +2059,7 @@ if __name__ == "__main__":
     else:
         # Kommandozeilen-Modus (ursprüngliche Funktionalität)
         if len(sys.argv) < 2:
-            print("Usage: python test.py <image_path_or_pdf_path>")
+            print("Usage: python test.py <image_path_or_pdf_path> [--profile <profil.json>]")
             print("Oder starten Sie ohne Argumente für den GUI-Modus")
             print("Unterstützte Formate:")
             print("  - Bilder: .jpg, .jpeg, .png, .bmp, .tiff, etc.")
@@ -796,8 +2071,18 @@ if __name__ == "__main__":
             print(f"Fehler: Datei nicht gefunden: {file_path}")
             sys.exit(1)
         
+        # Optionales Parameterprofil (z.B. von tune.py erstellt)
+        detector_params = {}
+        if "--profile" in sys.argv:
+            profile_index = sys.argv.index("--profile") + 1
+            if profile_index >= len(sys.argv):
+                print("Fehler: --profile erwartet einen Dateipfad")
+                sys.exit(1)
+            detector_params = load_detector_profile(sys.argv[profile_index])
+            print(f"Profil geladen: {detector_params}")
+        
         print(f"Verarbeite Datei: {file_path}")
-        rectangles = detect_rectangles(file_path)
+        rectangles, labels = detect_rectangles(file_path, **detector_params)
         
         if is_pdf_file(file_path):
             total_rectangles = sum(len(page_rects) for page_rects in rectangles)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests für das Undo/Redo-Befehlsprotokoll
+"""
+
+import random
+from collections import Counter
+
+from test import EditHistory, apply_edit_command, diff_edit_command, invert_edit_command
+
+def test_invert_round_trip_for_each_command():
+    original = [(0, 0, 10, 10), (20, 0, 30, 10)]
+    commands = [
+        ("add", 1, (50, 50, 60, 60)),
+        ("remove", 0, (0, 0, 10, 10)),
+        ("move", 1, 5, -3),
+        ("group", (("add", 2, (1, 1, 2, 2)), ("move", 0, 1, 1), ("remove", 1, (20, 0, 30, 10)))),
+    ]
+    for command in commands:
+        rectangles = list(original)
+        apply_edit_command(rectangles, command)
+        apply_edit_command(rectangles, invert_edit_command(command))
+        assert rectangles == original
+
+def test_diff_round_trip_random():
+    rng = random.Random(0)
+    for _ in range(500):
+        old = [(rng.randint(0, 5), 0, 1, 1) for _ in range(rng.randint(0, 8))]
+        new = [(rng.randint(0, 5), 0, 1, 1) for _ in range(rng.randint(0, 8))]
+        rectangles = list(old)
+        command = diff_edit_command(rectangles, new)
+
+        apply_edit_command(rectangles, command)
+        assert Counter(rectangles) == Counter(new)
+
+        apply_edit_command(rectangles, invert_edit_command(command))
+        assert rectangles == old
+
+def test_diff_only_records_changes():
+    old = [(i, 0, i + 1, 1) for i in range(100)]
+    new = old[:50] + old[51:] + [(500, 0, 501, 1)]
+    kind, commands = diff_edit_command(old, new)
+
+    assert kind == "group"
+    assert commands == (("remove", 50, (50, 0, 51, 1)), ("add", 99, (500, 0, 501, 1)))
+
+def test_history_undo_redo():
+    history = EditHistory()
+    rectangles = []
+    command = ("add", 0, (1, 2, 3, 4))
+    apply_edit_command(rectangles, command)
+    history.push(command)
+
+    assert history.undo(rectangles) == ("remove", 0, (1, 2, 3, 4))
+    assert rectangles == []
+    assert history.undo(rectangles) is None
+
+    assert history.redo(rectangles) == command
+    assert rectangles == [(1, 2, 3, 4)]
+    assert history.redo(rectangles) is None
+
+def test_push_clears_redo_and_ignores_empty_group():
+    history = EditHistory()
+    rectangles = [(0, 0, 1, 1)]
+    history.push(("move", 0, 0, 0))
+    history.undo(rectangles)
+    history.push(("group", ()))
+    assert history.redo_stack
+
+    history.push(("add", 1, (2, 2, 3, 3)))
+    assert not history.redo_stack
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests für die IoU-Berechnung und Zuordnung der Bewertung (evaluate.py)
+"""
+
+import numpy as np
+
+from evaluate import match_rectangles, pairwise_iou
+
+def boxes(*rects):
+    return np.array(rects, dtype=np.float64).reshape(-1, 4)
+
+def test_pairwise_iou_values():
+    a = boxes((0, 0, 10, 10), (100, 100, 110, 110))
+    b = boxes((0, 0, 10, 10), (5, 0, 15, 10), (20, 20, 30, 30))
+    iou = pairwise_iou(a, b)
+
+    assert iou.shape == (2, 3)
+    assert iou[0, 0] == 1.0
+    assert np.isclose(iou[0, 1], 50 / 150)
+    assert iou[0, 2] == 0.0
+    assert not iou[1].any()
+
+def test_pairwise_iou_degenerate_boxes():
+    iou = pairwise_iou(boxes((5, 5, 5, 5)), boxes((5, 5, 5, 5)))
+    assert iou[0, 0] == 0.0
+
+def test_match_is_one_to_one_by_best_iou():
+    ground_truth = boxes((0, 0, 10, 10))
+    # Beide überlappen ausreichend, nur das bessere wird zugeordnet
+    predicted = boxes((1, 0, 11, 10), (0, 0, 10, 10))
+    assert match_rectangles(predicted, ground_truth) == [1.0]
+
+def test_match_respects_threshold():
+    predicted = boxes((5, 0, 15, 10))
+    ground_truth = boxes((0, 0, 10, 10))
+    assert match_rectangles(predicted, ground_truth, iou_threshold=0.5) == []
+    assert np.isclose(match_rectangles(predicted, ground_truth, iou_threshold=0.3)[0], 1 / 3)
+
+def test_match_greedy_prefers_higher_iou():
+    ground_truth = boxes((0, 0, 10, 10), (8, 0, 18, 10))
+    predicted = boxes((1, 0, 11, 10), (7, 0, 17, 10))
+    matched = match_rectangles(predicted, ground_truth)
+
+    assert len(matched) == 2
+    assert np.allclose(sorted(matched), [90 / 110, 90 / 110])
+
+def test_match_empty_inputs():
+    assert match_rectangles(boxes(), boxes((0, 0, 1, 1))) == []
+    assert match_rectangles(boxes((0, 0, 1, 1)), boxes()) == []
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests für die Erkennung von Parkreihen (fit_parking_rows / rows_to_rectangles)
+"""
+
+import json
+import os
+
+from test import fit_parking_rows, rows_to_rectangles
+
+def make_row(x0, y0, count, pitch=48, width=45, height=93):
+    return [(x0 + k * pitch, y0, x0 + k * pitch + width, y0 + height) for k in range(count)]
+
+def test_fills_missing_bay():
+    bays = make_row(100, 200, 10)
+    del bays[4]
+    rows, unassigned = fit_parking_rows(bays)
+
+    assert len(rows) == 1
+    assert rows[0]["count"] == 10
+    assert rows[0]["pitch"][0] == 48
+    assert rows[0]["size"] == [45.0, 93.0]
+    assert unassigned == []
+    assert (292, 200, 337, 293) in rows_to_rectangles(rows)
+
+def test_rejects_outlier_and_splits_large_gap():
+    bays = make_row(100, 200, 5) + make_row(100 + 10 * 48, 200, 5)
+    sliver = (130, 200, 140, 293)
+    rows, unassigned = fit_parking_rows(bays + [sliver])
+
+    # Lücke von 5 Stellplätzen ist größer als max_missing=2
+    assert sorted(row["count"] for row in rows) == [5, 5]
+    assert unassigned == [sliver]
+
+def test_vertical_row():
+    bays = [(300, 100 + k * 48, 393, 145 + k * 48) for k in range(6)]
+    rows, unassigned = fit_parking_rows(bays)
+
+    assert len(rows) == 1
+    assert rows[0]["pitch"][0] == 0.0
+    assert rows[0]["pitch"][1] == 48
+    assert rows[0]["count"] == 6
+    assert unassigned == []
+    assert rows_to_rectangles(rows) == bays
+
+def test_too_few_bays_stay_unassigned():
+    bays = make_row(100, 200, 2)
+    rows, unassigned = fit_parking_rows(bays)
+    assert rows == []
+    assert unassigned == bays
+
+def test_hv1_rows():
+    with open(os.path.join(os.path.dirname(__file__), "HV1.json"), 'r', encoding='utf-8') as f:
+        rectangles = json.load(f)["rectangles"]
+    rows, unassigned = fit_parking_rows(rectangles)
+
+    assert len(rows) == 9
+    # Die Doppelstellplätze überdecken Rasterplätze und werden nicht zugeordnet
+    assert len(unassigned) == 5
+    assert sum(row["count"] for row in rows) == 117
+
+def test_without_gap_filling_rows_cover_only_existing_bays():
+    bays = make_row(100, 200, 10)
+    del bays[4]
+    rows, unassigned = fit_parking_rows(bays, max_missing=0)
+
+    assert sorted(row["count"] for row in rows) == [4, 5]
+    assert sorted(rows_to_rectangles(rows)) == sorted(bays)
+    assert unassigned == []
+
+def test_hv1_rows_without_gap_filling():
+    with open(os.path.join(os.path.dirname(__file__), "HV1.json"), 'r', encoding='utf-8') as f:
+        rectangles = json.load(f)["rectangles"]
+    rows, unassigned = fit_parking_rows(rectangles, max_missing=0)
+
+    assert sum(row["count"] for row in rows) == len(rectangles) - len(unassigned)
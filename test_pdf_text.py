@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Tests für das Auslesen von Stellplatznummern aus dem PDF-Text (extract_text_spans)
+"""
+
+import fitz  # PyMuPDF
+import numpy as np
+import pytest
+
+from test import extract_text_spans
+
+def ink_box(pdf_path, dpi):
+    """Umschließendes Rechteck aller dunklen Pixel der gerenderten ersten Seite"""
+    zoom = dpi / 72.0
+    with fitz.open(pdf_path) as doc:
+        pix = doc[0].get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    ys, xs = np.nonzero(gray < 128)
+    return xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+
+@pytest.mark.parametrize("rotation", [0, 90, 180, 270])
+def test_span_matches_rendered_ink(tmp_path, rotation):
+    pdf_path = str(tmp_path / f"rotated_{rotation}.pdf")
+    doc = fitz.open()
+    page = doc.new_page(width=842, height=595)
+    page.insert_text((100, 500), "A17", fontsize=36)
+    page.set_rotation(rotation)
+    doc.save(pdf_path)
+    doc.close()
+
+    spans = extract_text_spans(pdf_path, 0, dpi=200)
+    assert [text for text, _ in spans] == ["A17"]
+
+    # Die Textbox enthält Ober- und Unterlängen, die Tinte muss vollständig darin liegen
+    x1, y1, x2, y2 = spans[0][1]
+    ix1, iy1, ix2, iy2 = ink_box(pdf_path, 200)
+    assert x1 - 2 <= ix1 and y1 - 2 <= iy1 and ix2 <= x2 + 2 and iy2 <= y2 + 2
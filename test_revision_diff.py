@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests für die Zuordnung von Rechtecken zweier Planrevisionen (revision_diff.py)
+"""
+
+from revision_diff import match_revision_rectangles
+
+def test_unchanged_within_tolerance():
+    old = [(0, 0, 45, 93), (48, 0, 93, 93)]
+    new = [(49, 1, 94, 93), (0, 0, 45, 93)]
+    changes = match_revision_rectangles(old, new)
+
+    assert changes == {"added": [], "removed": [], "moved": [], "unchanged": 2}
+
+def test_moved_added_removed():
+    old = [(0, 0, 45, 93), (500, 500, 545, 593)]
+    new = [(0, 150, 45, 243), (1000, 1000, 1100, 1100)]
+    changes = match_revision_rectangles(old, new)
+
+    assert changes["moved"] == [{"from": [0, 0, 45, 93], "to": [0, 150, 45, 243]}]
+    assert changes["added"] == [[1000, 1000, 1100, 1100]]
+    assert changes["removed"] == [[500, 500, 545, 593]]
+    assert changes["unchanged"] == 0
+
+def test_move_needs_same_size_and_max_distance():
+    old = [(0, 0, 45, 93), (1000, 0, 1045, 93)]
+    # Andere Größe bzw. weiter als max_move entfernt
+    new = [(10, 10, 80, 103), (1000, 300, 1045, 393)]
+    changes = match_revision_rectangles(old, new, max_move=200)
+
+    assert changes["moved"] == []
+    assert len(changes["added"]) == 2
+    assert len(changes["removed"]) == 2
+
+def test_move_prefers_nearest_candidate():
+    old = [(0, 0, 45, 93), (100, 0, 145, 93)]
+    new = [(0, 0, 45, 93), (110, 20, 155, 113)]
+    changes = match_revision_rectangles(old, new)
+
+    assert changes["unchanged"] == 1
+    assert changes["moved"] == [{"from": [100, 0, 145, 93], "to": [110, 20, 155, 113]}]
+    assert changes["removed"] == []
+
+def test_each_old_rectangle_matched_once():
+    old = [(0, 0, 45, 93)]
+    new = [(0, 0, 45, 93), (1, 1, 46, 94)]
+    changes = match_revision_rectangles(old, new)
+
+    assert changes["unchanged"] == 1
+    assert changes["added"] == [[1, 1, 46, 94]]
+    assert changes["removed"] == []
+
+def test_redetect_keeps_rectangles_outside_regions_unchanged(monkeypatch):
+    import fitz  # PyMuPDF
+    import revision_diff
+
+    # Doppelte Einträge der Erkennung außerhalb des Bereichs dürfen nicht verschwinden
+    previous = [(100, 100, 145, 193), (100, 100, 145, 193), (1000, 1000, 1045, 1093), (1400, 900, 1445, 993)]
+    region = (950, 950, 1200, 1200)
+    calls = []
+
+    def fake_detect(img, region, origin=(0, 0), image_size=None, **params):
+        calls.append((img.shape[:2], origin, image_size))
+        return [(1010, 1000, 1055, 1093), (1010, 1000, 1055, 1093), (100, 100, 145, 193)]
+
+    monkeypatch.setattr(revision_diff, "detect_rectangles_in_region", fake_detect)
+    doc = fitz.open()
+    page = doc.new_page(width=842, height=595)
+    rectangles = revision_diff._redetect_regions(page, previous, [region], {})
+
+    # Nur der Bereich wird gerendert, nicht die ganze Seite
+    (height, width), (ox, oy), image_size = calls[0]
+    assert len(calls) == 1 and image_size == (2339, 1653)
+    assert abs(ox - 950) <= 1 and abs(oy - 950) <= 1
+    assert abs(width - 250) <= 2 and abs(height - 250) <= 2
+    assert rectangles == [(100, 100, 145, 193), (100, 100, 145, 193), (1400, 900, 1445, 993),
+                          (1010, 1000, 1055, 1093), (1010, 1000, 1055, 1093)]
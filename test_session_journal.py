@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests für das Auto-Speichern der Sitzung (SessionJournal)
+"""
+
+import json
+
+from test import SessionJournal
+
+def write_session(base_path, snapshot, journal_lines):
+    journal_path, snapshot_path = SessionJournal.session_paths(base_path)
+    with open(snapshot_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    with open(journal_path, 'w', encoding='utf-8') as f:
+        f.write(journal_lines)
+
+def entry(seq, command):
+    return json.dumps({"seq": seq, "command": command}) + "\n"
+
+def test_load_without_session(tmp_path):
+    assert SessionJournal.load(str(tmp_path / "plan.png")) is None
+
+def test_load_stops_at_truncated_last_line(tmp_path):
+    base_path = str(tmp_path / "plan.png")
+    lines = (entry(1, ["add", 0, [1, 2, 3, 4]])
+             + entry(2, ["add", 1, [5, 6, 7, 8]])
+             + entry(3, ["move", 0, 10, 10])[:12])
+    write_session(base_path, {"rectangles": [], "seq": 0, "export_timestamp": 0}, lines)
+
+    assert SessionJournal.load(base_path) == [(1, 2, 3, 4), (5, 6, 7, 8)]
+
+def test_load_skips_entries_already_in_snapshot(tmp_path):
+    base_path = str(tmp_path / "plan.png")
+    snapshot = {"rectangles": [[1, 2, 3, 4], [5, 6, 7, 8]], "seq": 2, "export_timestamp": 0}
+    # Einträge 1 und 2 sind schon im Snapshot enthalten (Absturz zwischen Snapshot und Kürzen)
+    lines = (entry(1, ["add", 0, [1, 2, 3, 4]])
+             + entry(2, ["add", 1, [5, 6, 7, 8]])
+             + entry(3, ["move", 1, 1, 1]))
+    write_session(base_path, snapshot, lines)
+
+    assert SessionJournal.load(base_path) == [(1, 2, 3, 4), (6, 7, 8, 9)]
+
+def test_round_trip_through_close(tmp_path):
+    base_path = str(tmp_path / "plan.png")
+    journal = SessionJournal(base_path, [(0, 0, 10, 10)])
+    journal.append(("add", 1, (20, 20, 30, 30)))
+    journal.append(("group", (("move", 0, 5, 5), ("remove", 1, (20, 20, 30, 30)))))
+    journal.close()
+
+    assert SessionJournal.load(base_path) == [(5, 5, 15, 15)]
+
+def test_successor_waits_for_background_close(tmp_path):
+    base_path = str(tmp_path / "plan.png")
+    first = SessionJournal(base_path, [])
+    first.append(("add", 0, (1, 1, 2, 2)))
+    first.close(wait=False)
+
+    second = SessionJournal(base_path, [(1, 1, 2, 2)], predecessor=first)
+    second.append(("move", 0, 1, 1))
+    second.close()
+
+    assert not first.thread.is_alive()
+    assert SessionJournal.load(base_path) == [(2, 2, 3, 3)]
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Automatische Suche nach Erkennungsparametern für einen Plantyp.
+
+Durchsucht ein Raster aus min_area, epsilon_coef, Blur-Kernel und Canny-Schwellen gegen
+beschriftete Seiten (Korpus-Aufbau wie bei evaluate.py) und speichert die beste Kombination
+als Parameterprofil. Das Profil kann mit "python test.py <datei> --profile <profil.json>"
+oder im Editor über "Profil laden" verwendet werden.
+
+Zwischenergebnisse werden geteilt: Graustufen- und geglättetes Bild pro Seite, Kantenbild
+und Konturen pro Canny-Kombination. Nur die letzte Stufe (Konturfilter) läuft für jede
+Kombination aus min_area und epsilon_coef erneut.
+
+Aufruf:
+  python tune.py <korpus_verzeichnis> --plan-type parkhaus
+                 [--min-area 500,1000,2000] [--epsilon-coef 0.01,0.02,0.04]
+                 [--blur-kernel 3,5,7] [--canny-low 30,50,80] [--canny-high 100,150,200]
+                 [--iou-threshold 0.5] [--workers N] [--output profil.json]
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from evaluate import find_corpus_pages, load_ground_truth, load_page_image, match_rectangles
+from test import blur_image, detect_edges, find_contours, rectangles_from_contours
+
+DEFAULT_SEARCH_SPACE = {
+    "min_area": [500, 1000, 2000],
+    "epsilon_coef": [0.01, 0.02, 0.04],
+    "blur_kernel": [3, 5, 7],
+    "canny_low": [30, 50, 80],
+    "canny_high": [100, 150, 200],
+}
+
+@lru_cache(maxsize=4)
+def _load_gray_page(path, page_num, gt_path):
+    """Lädt eine Seite einmal pro Worker-Prozess als Graustufenbild samt Ground Truth"""
+    gray = cv2.cvtColor(load_page_image(path, page_num), cv2.COLOR_BGR2GRAY)
+    return gray, load_ground_truth(gt_path)
+
+@lru_cache(maxsize=8)
+def _load_blurred_page(path, page_num, gt_path, blur_kernel):
+    """Geglättetes Bild pro Seite und Kernel, geteilt von allen Canny-Kombinationen"""
+    gray, _ = _load_gray_page(path, page_num, gt_path)
+    start = time.perf_counter()
+    blurred = blur_image(gray, blur_kernel)
+    return blurred, time.perf_counter() - start
+
+def run_trials(task):
+    """
+    Führt alle Versuche für eine Seite und eine Kombination früher Stufen aus (läuft in einem Worker-Prozess).
+
+    :param task: (Dateipfad, Seitennummer, Ground-Truth-Pfad, Blur-Kernel, Canny-Low, Canny-High,
+                  Liste von (min_area, epsilon_coef), IoU-Schwelle)
+    :return: Liste von (Parameter-Tupel, erkannt, Ground Truth, Treffer, IoU-Summe, Laufzeit)
+    """
+    path, page_num, gt_path, blur_kernel, canny_low, canny_high, late_combos, iou_threshold = task
+    _, ground_truth = _load_gray_page(path, page_num, gt_path)
+    blurred, blur_time = _load_blurred_page(path, page_num, gt_path, blur_kernel)
+
+    start = time.perf_counter()
+    edges = detect_edges(blurred, canny_low, canny_high)
+    contours = find_contours(edges)
+    shared_time = blur_time + time.perf_counter() - start
+
+    results = []
+    for min_area, epsilon_coef in late_combos:
+        start = time.perf_counter()
+        rectangles, _ = rectangles_from_contours(contours, min_area, epsilon_coef)
+        # Laufzeit entspricht einem vollständigen Durchlauf ohne Cache
+        latency = shared_time + time.perf_counter() - start
+
+        predicted = np.array(rectangles, dtype=np.float64).reshape(-1, 4)
+        matched = match_rectangles(predicted, ground_truth, iou_threshold)
+        params = (min_area, epsilon_coef, blur_kernel, canny_low, canny_high)
+        results.append((params, len(predicted), len(ground_truth), len(matched), sum(matched), latency))
+    return results
+
+def tune_parameters(pages, search_space=None, iou_threshold=0.5, workers=None):
+    """
+    Durchsucht den Parameterraum parallel und bewertet jede Kombination über alle Seiten.
+
+    :param pages: Liste von (Dateipfad, Seitennummer, Ground-Truth-Pfad) wie von find_corpus_pages
+    :param search_space: Dict mit Wertelisten pro Parameter (Standardraster wenn None)
+    :param iou_threshold: Mindest-IoU für einen Treffer
+    :param workers: Anzahl Worker-Prozesse (None = Anzahl CPU-Kerne)
+    :return: Liste von Ergebnis-Dicts, absteigend nach F1-Score sortiert
+    """
+    space = dict(DEFAULT_SEARCH_SPACE, **(search_space or {}))
+    for name, values in space.items():
+        if not values:
+            raise ValueError(f"Keine Werte für {name} angegeben")
+    for kernel in space["blur_kernel"]:
+        if kernel <= 0 or kernel % 2 == 0:
+            raise ValueError(f"Blur-Kernel muss positiv und ungerade sein: {kernel}")
+
+    late_combos = list(itertools.product(space["min_area"], space["epsilon_coef"]))
+    canny_combos = [(low, high) for low, high in itertools.product(space["canny_low"], space["canny_high"])
+                    if low < high]
+    if not canny_combos:
+        raise ValueError(f"Keine gültige Canny-Kombination: jeder untere Schwellwert {space['canny_low']} "
+                         f"muss kleiner als ein oberer {space['canny_high']} sein")
+
+    # Aufgaben derselben Seite und desselben Kernels liegen hintereinander, damit die Caches greifen
+    tasks = [(path, page_num, gt_path, kernel, low, high, late_combos, iou_threshold)
+             for path, page_num, gt_path in pages
+             for kernel in space["blur_kernel"]
+             for low, high in canny_combos]
+
+    totals = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for trial_results in executor.map(run_trials, tasks, chunksize=max(1, len(canny_combos))):
+            for params, predicted, ground_truth, true_positives, iou_sum, latency in trial_results:
+                total = totals.setdefault(params, [0, 0, 0, 0.0, 0.0])
+                total[0] += predicted
+                total[1] += ground_truth
+                total[2] += true_positives
+                total[3] += iou_sum
+                total[4] += latency
+
+    ranking = []
+    for params, (predicted, ground_truth, true_positives, iou_sum, latency) in totals.items():
+        precision = true_positives / predicted if predicted else 0.0
+        recall = true_positives / ground_truth if ground_truth else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        ranking.append({
+            "params": dict(zip(("min_area", "epsilon_coef", "blur_kernel", "canny_low", "canny_high"), params)),
+            "precision": precision,
+            "recall": recall,
+            "f1": f1,
+            "mean_iou": iou_sum / true_positives if true_positives else 0.0,
+            "latency_s": latency / len(pages),
+        })
+
+    # Bei gleichem F1-Score gewinnt die schnellere Kombination
+    ranking.sort(key=lambda r: (-r["f1"], r["latency_s"]))
+    return ranking
+
+def save_profile(profile_path, plan_type, best, page_count):
+    """
+    Speichert die beste Parameterkombination als Profil (lesbar mit load_detector_profile).
+
+    :param profile_path: Zielpfad der Profil-JSON-Datei
+    :param plan_type: Name des Plantyps
+    :param best: Bestes Ergebnis-Dict aus tune_parameters
+    :param page_count: Anzahl der bewerteten Seiten
+    """
+    data = {
+        "plan_type": plan_type,
+        "params": best["params"],
+        "score": {k: best[k] for k in ("precision", "recall", "f1", "mean_iou", "latency_s")},
+        "pages": page_count,
+        "export_timestamp": int(time.time()),
+    }
+    with open(profile_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+def _parse_list(value_type):
+    def parse(text):
+        return [value_type(v) for v in text.split(",") if v.strip()]
+    return parse
+
+def main():
+    parser = argparse.ArgumentParser(description="Sucht Erkennungsparameter gegen beschriftete Seiten")
+    parser.add_argument("corpus_dir", help="Verzeichnis mit Bildern/PDFs und Ground-Truth-JSON-Dateien")
+    parser.add_argument("--plan-type", required=True, help="Name des Plantyps für das Profil")
+    parser.add_argument("--min-area", type=_parse_list(float))
+    parser.add_argument("--epsilon-coef", type=_parse_list(float))
+    parser.add_argument("--blur-kernel", type=_parse_list(int))
+    parser.add_argument("--canny-low", type=_parse_list(int))
+    parser.add_argument("--canny-high", type=_parse_list(int))
+    parser.add_argument("--iou-threshold", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Worker-Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--output", help="Pfad des Profils (Standard: profile_<plan-type>.json)")
+    args = parser.parse_args()
+
+    pages = find_corpus_pages(args.corpus_dir)
+    if not pages:
+        print(f"Fehler: Keine Seiten mit Ground Truth in {args.corpus_dir} gefunden")
+        sys.exit(1)
+
+    search_space = {name: getattr(args, name) for name in DEFAULT_SEARCH_SPACE if getattr(args, name)}
+    start = time.perf_counter()
+    try:
+        ranking = tune_parameters(pages, search_space, args.iou_threshold, args.workers)
+    except ValueError as e:
+        print(f"Fehler: {e}")
+        sys.exit(1)
+    print(f"{len(ranking)} Kombinationen auf {len(pages)} Seite(n) in {time.perf_counter() - start:.1f} s bewertet.\n")
+
+    print(f"{'F1':>6} {'Prec.':>6} {'Recall':>6} {'IoU':>6} {'Zeit[s]':>8}  Parameter")
+    for result in ranking[:10]:
+        print(f"{result['f1']:>6.3f} {result['precision']:>6.3f} {result['recall']:>6.3f} "
+              f"{result['mean_iou']:>6.3f} {result['latency_s']:>8.3f}  {result['params']}")
+
+    profile_path = args.output or f"profile_{args.plan_type}.json"
+    save_profile(profile_path, args.plan_type, ranking[0], len(pages))
+    print(f"\nProfil gespeichert in: {profile_path}")
+
+if __name__ == "__main__":
+    main()